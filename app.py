@@ -1,25 +1,51 @@
 import streamlit as st
-from streamlit_float import float_init
 import logging
 from pathlib import Path
-from typing import Tuple
+from typing import Tuple, TYPE_CHECKING
 import os
 
 from src.components.chat_box import ChatBox
-from src.components.recorder import AudioRecorder
 from src.components.emotion_display import EmotionDisplay
 from src.utils.logger import setup_logging
-from src.conversation.handler import ConversationHandler
-from src.services.tts import TextToSpeech
-from src.services.speech_to_text import SpeechToText
 from src.utils.helpers import initialize_session_state
-from config import Config
+from config import CONFIG
+
+# Heavy service modules (gRPC, LLM SDKs, recorder component) are imported lazily
+if TYPE_CHECKING:
+    from src.components.recorder import AudioRecorder
+    from src.conversation.handler import ConversationHandler
+    from src.services.tts import TextToSpeech
+    from src.services.speech_to_text import SpeechToText
+
+# Services are built before set_page_config runs, so the getters must not draw a spinner
+@st.cache_resource(show_spinner=False)
+def get_tts() -> "TextToSpeech":
+    """Create the process-wide text-to-speech service"""
+    from src.services.tts import TextToSpeech
+    return TextToSpeech()
+
+@st.cache_resource(show_spinner=False)
+def get_stt() -> "SpeechToText":
+    """Create the process-wide speech-to-text service"""
+    from src.services.speech_to_text import SpeechToText
+    return SpeechToText()
+
+@st.cache_resource(show_spinner=False)
+def get_conversation_handler(_tts_service: "TextToSpeech") -> "ConversationHandler":
+    """Create the process-wide conversation handler"""
+    from src.conversation.handler import ConversationHandler
+    return ConversationHandler(_tts_service)
+
+@st.cache_data
+def _load_css(path: str, mtime: float) -> str:
+    """Build the <style> block for a stylesheet, keyed on modification time so edits invalidate"""
+    return f'<style>{Path(path).read_text()}</style>'
 
 class TAFEPApp:
     def __init__(self):
         """Initialize TAFEP application"""
         self.logger = logging.getLogger(__name__)
-        self.config = Config()
+        self.config = CONFIG
         
         # Initialize services
         self._initialize_services()
@@ -27,17 +53,19 @@ class TAFEPApp:
     def _initialize_services(self):
         """Initialize core services with error handling"""
         try:
-            self.tts_service = TextToSpeech()
-            self.conversation_handler = ConversationHandler(self.tts_service)
-            self.speech_to_text = SpeechToText()
-            self.logger.debug(f"Initialize Services Completed")
+            self.tts_service = get_tts()
+            self.conversation_handler = get_conversation_handler(self.tts_service)
+            self.speech_to_text = get_stt()
+            self.logger.debug("Initialize Services Completed")
         except Exception as e:
-            self.logger.error(f"Failed to initialize services: {e}")
+            self.logger.error("Failed to initialize services: %s", e)
             raise
 
     def setup_page_config(self):
         """Configure Streamlit page settings"""
         try:
+            from streamlit_float import float_init
+
             st.set_page_config(
                 page_title="TAFEP Voice Assistant",
                 page_icon="🎙️",
@@ -45,9 +73,9 @@ class TAFEPApp:
                 initial_sidebar_state="collapsed"
             )
             float_init()
-            self.logger.debug(f"Setup Page Config Completed")
+            self.logger.debug("Setup Page Config Completed")
         except Exception as e:
-            self.logger.error(f"Failed to setup page config: {e}")
+            self.logger.error("Failed to setup page config: %s", e)
             st.error("Error initializing application. Please refresh the page.")
 
     def load_custom_css(self):
@@ -55,17 +83,20 @@ class TAFEPApp:
         try:
             css_path = Path('static/css/style.css')
             if css_path.exists():
-                with open(css_path) as f:
-                    st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
-                    self.logger.debug(f"Load Custom CSS Completed")
+                # Must be emitted on every rerun: Streamlit drops elements a run does not re-send
+                style_block = _load_css(str(css_path), css_path.stat().st_mtime)
+                st.markdown(style_block, unsafe_allow_html=True)
+                self.logger.debug("Load Custom CSS Completed")
             else:
                 self.logger.warning("CSS file not found")
         except Exception as e:
-            self.logger.error(f"Failed to load CSS: {e}")
+            self.logger.error("Failed to load CSS: %s", e)
 
-    def initialize_components(self) -> Tuple[ChatBox, AudioRecorder, EmotionDisplay]:
+    def initialize_components(self) -> Tuple[ChatBox, "AudioRecorder", EmotionDisplay]:
         """Initialize UI components with proper dependency injection"""
         try:
+            from src.components.recorder import AudioRecorder
+
             # Initialize chat box
             chat_box = ChatBox()
 
@@ -79,33 +110,35 @@ class TAFEPApp:
             # Initialize emotion display
             emotion_display = EmotionDisplay()
 
-            self.logger.debug(f"Initialize Components Completed")
+            self.logger.debug("Initialize Components Completed")
             
             return chat_box, audio_recorder, emotion_display
             
         except Exception as e:
-            self.logger.error(f"Failed to initialize components: {e}")
+            self.logger.error("Failed to initialize components: %s", e)
             st.error("Error initializing application components. Please refresh the page.")
             raise
 
-    def handle_audio_recording(self, audio_recorder: AudioRecorder):
+    def handle_audio_recording(self, audio_recorder: "AudioRecorder"):
         """Handle audio recording and processing"""
         try:
             footer = st.container()
+
+            # Float the footer before recording, which blocks while listening
+            footer.float("bottom: 0rem;")
+
             with footer:
                 col1, col2 = st.columns([1, 9])
                 with col1:
                     audio_bytes = audio_recorder.record()
                     
                 if audio_bytes and not audio_recorder.is_processing:
-                    with st.spinner("Processing your message..."):
-                        audio_recorder.process_recording(audio_bytes)
-            
-            # Float the footer
-            footer.float("bottom: 0rem;")
+                    audio_recorder.process_recording(audio_bytes)
+                    # Redraw the chat with the new turn and resume listening
+                    st.rerun()
             
         except Exception as e:
-            self.logger.error(f"Error in audio recording: {e}")
+            self.logger.error("Error in audio recording: %s", e)
             st.error("Error processing audio. Please try again.")
 
     def run(self):
@@ -125,7 +158,7 @@ class TAFEPApp:
             st.title("TAFEP Voice Assistant 🎙️")
             
             # Chat display area
-            chat_container = st.container()
+            chat_container = st.container(key="chat")
             with chat_container:
                 chat_box.display_messages()
             
@@ -133,7 +166,7 @@ class TAFEPApp:
             self.handle_audio_recording(audio_recorder)
             
         except Exception as e:
-            self.logger.error(f"Application error: {e}")
+            self.logger.error("Application error: %s", e)
             st.error("An unexpected error occurred. Please refresh the page.")
 
 def main():
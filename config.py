@@ -1,99 +1,108 @@
 import os
+from dataclasses import dataclass, field, fields
 from pathlib import Path
+from typing import Any, Callable, ClassVar, Optional
 from dotenv import load_dotenv
 
 # Load environment variables at config initialization
 load_dotenv(override=True)
 
+def _required(description: str, cast: Optional[Callable[[str], Any]] = None):
+    """Declare a required setting with its description and optional type conversion"""
+    return field(metadata={"description": description, "cast": cast})
+
+def _secret(description: str):
+    """Declare a required credential, kept out of the generated repr"""
+    return field(repr=False, metadata={"description": description, "cast": None})
+
+@dataclass(frozen=True, slots=True)
 class Config:
     """Application configuration"""
-    
+
     # Base paths
-    BASE_DIR = Path(__file__).resolve().parent
-    DEBUG_DIR = BASE_DIR / "debug"
-    LOGS_DIR = BASE_DIR / "logs"
-    TEMP_DIR = BASE_DIR / "temp"
-    
+    BASE_DIR: ClassVar[Path] = Path(__file__).resolve().parent
+    DEBUG_DIR: ClassVar[Path] = BASE_DIR / "debug"
+    LOGS_DIR: ClassVar[Path] = BASE_DIR / "logs"
+    TEMP_DIR: ClassVar[Path] = BASE_DIR / "temp"
+
     # API Keys and Authentication
-    ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
-    OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-    ELEVENLABS_API_KEY = os.getenv('ELEVENLABS_API_KEY')
-    
+    ANTHROPIC_API_KEY: Optional[str] = _secret('Anthropic API key')
+    OPENAI_API_KEY: Optional[str] = _secret('OpenAI API key')
+    ELEVENLABS_API_KEY: Optional[str] = _secret('ElevenLabs API key')
+
     # Hume AI Settings
-    HUME_API_KEY = os.getenv('HUME_API_KEY')
-    HUME_SECRET_KEY = os.getenv('HUME_SECRET_KEY')
-    HUME_CONFIG_ID = os.getenv('HUME_CONFIG_ID')
-    HUME_API_HOST = os.getenv('HUME_API_HOST')
-    
+    HUME_API_KEY: Optional[str] = _secret('Hume API key')
+    HUME_SECRET_KEY: Optional[str] = _secret('Hume secret key')
+    HUME_CONFIG_ID: Optional[str] = _required('Hume config ID')
+    HUME_API_HOST: Optional[str] = _required('Hume API host')
+
     # Google Cloud Settings
-    GOOGLE_APPLICATION_CREDENTIALS = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
-    GOOGLE_CLOUD_PROJECT = os.getenv('GOOGLE_CLOUD_PROJECT')
-    
+    GOOGLE_APPLICATION_CREDENTIALS: Optional[str] = _secret('Google Cloud credentials path')
+    GOOGLE_CLOUD_PROJECT: Optional[str] = _required('Google Cloud project ID')
+
     # AI Model Settings
-    AI_MODEL = os.getenv('AI_MODEL')
-    AI_MODEL_VERSION = os.getenv('AI_MODEL_VERSION')
-    
+    AI_MODEL: Optional[str] = _required('AI model selection')
+    AI_MODEL_VERSION: Optional[str] = _required('AI model version')
+
     # Audio Settings
-    SAMPLE_RATE = int(os.getenv('SAMPLE_RATE')) if os.getenv('SAMPLE_RATE') else None
-    SAMPLE_WIDTH = int(os.getenv('SAMPLE_WIDTH')) if os.getenv('SAMPLE_WIDTH') else None
-    CHANNELS = int(os.getenv('CHANNELS')) if os.getenv('CHANNELS') else None
-    CHUNK_SIZE = int(os.getenv('CHUNK_SIZE')) if os.getenv('CHUNK_SIZE') else None
-    FORMAT = 'paInt16'  # PyAudio format constant
-    SILENCE_THRESHOLD = int(os.getenv('SILENCE_THRESHOLD')) if os.getenv('SILENCE_THRESHOLD') else None
-    MIN_AUDIO_LENGTH = float(os.getenv('MIN_AUDIO_LENGTH')) if os.getenv('MIN_AUDIO_LENGTH') else None
-    MAX_SILENCE_DURATION = float(os.getenv('MAX_SILENCE_DURATION')) if os.getenv('MAX_SILENCE_DURATION') else None
-    
+    SAMPLE_RATE: Optional[int] = _required('Sample rate', int)
+    SAMPLE_WIDTH: Optional[int] = _required('Sample width', int)
+    CHANNELS: Optional[int] = _required('Audio channels', int)
+    CHUNK_SIZE: Optional[int] = _required('Chunk size', int)
+    FORMAT: ClassVar[str] = 'paInt16'  # PyAudio format constant
+    SILENCE_THRESHOLD: Optional[int] = _required('Silence threshold', int)
+    MIN_AUDIO_LENGTH: Optional[float] = _required('Minimum audio length', float)
+    MAX_SILENCE_DURATION: Optional[float] = _required('Maximum silence duration', float)
+
     # TTS Settings
-    TTS_VOICE = os.getenv('TTS_VOICE')
-    TTS_MODEL = os.getenv('TTS_MODEL')
-    
+    TTS_VOICE: Optional[str] = _required('Text-to-speech voice')
+    TTS_MODEL: Optional[str] = _required('Text-to-speech model')
+
     # Development Settings
-    DEBUG = os.getenv('DEBUG')
-    LOG_LEVEL = os.getenv('LOG_LEVEL')
-    PORT = int(os.getenv('PORT')) if os.getenv('PORT') else None
-    ENVIRONMENT = os.getenv('ENVIRONMENT')
-    
+    DEBUG: Optional[str] = _required('Debug mode')
+    LOG_LEVEL: Optional[str] = _required('Logging level')
+    PORT: Optional[int] = _required('Application port', int)
+    ENVIRONMENT: Optional[str] = _required('Environment type')
+    DEBUG_SAMPLE_RATE: ClassVar[int] = 10  # Save one in N utterances when DEBUG is on
+
     # Application Settings
-    PROBE_LIMIT = int(os.getenv('PROBE_LIMIT')) if os.getenv('PROBE_LIMIT') else None
-    MAX_CONVERSATION_HISTORY = int(os.getenv('MAX_CONVERSATION_HISTORY')) if os.getenv('MAX_CONVERSATION_HISTORY') else None
-    
+    PROBE_LIMIT: Optional[int] = _required('Probe limit', int)
+    MAX_CONVERSATION_HISTORY: Optional[int] = _required('Maximum conversation history', int)
+    HISTORY_TOKEN_BUDGET: ClassVar[int] = 2000  # Tokens of recent history before summarizing
+    MAX_CONCURRENT_LLM: ClassVar[int] = 8  # In-flight completions shared across sessions
+
+    # Derived values, specialized once in __post_init__
+    _ws_prefix: str = field(init=False, repr=False, compare=False)
+    _ws_suffix: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        """Precompute the constant parts of the WebSocket URL"""
+        object.__setattr__(self, '_ws_prefix', f"wss://{self.HUME_API_HOST}/v0/evi/chat?access_token=")
+        object.__setattr__(self, '_ws_suffix', f"&config_id={self.HUME_CONFIG_ID}")
+
     @classmethod
-    def validate_config(cls):
+    def from_env(cls) -> "Config":
+        """Build configuration from a single read of the process environment"""
+        env = dict(os.environ)
+        values = {}
+        for f in fields(cls):
+            if not f.init:
+                continue
+            value = env.get(f.name)
+            cast = f.metadata["cast"]
+            if cast:
+                value = cast(value) if value else None
+            values[f.name] = value
+        return cls(**values)
+
+    def validate_config(self):
         """Validate required configuration settings"""
-        required_vars = {
-            'ANTHROPIC_API_KEY': 'Anthropic API key',
-            'OPENAI_API_KEY': 'OpenAI API key',
-            'ELEVENLABS_API_KEY': 'ElevenLabs API key',
-            'HUME_API_KEY': 'Hume API key',
-            'HUME_SECRET_KEY': 'Hume secret key',
-            'HUME_CONFIG_ID': 'Hume config ID',
-            'HUME_API_HOST': 'Hume API host',
-            'GOOGLE_APPLICATION_CREDENTIALS': 'Google Cloud credentials path',
-            'GOOGLE_CLOUD_PROJECT': 'Google Cloud project ID',
-            'AI_MODEL': 'AI model selection',
-            'AI_MODEL_VERSION': 'AI model version',
-            'SAMPLE_RATE': 'Sample rate',
-            'SAMPLE_WIDTH': 'Sample width',
-            'CHANNELS': 'Audio channels',
-            'CHUNK_SIZE': 'Chunk size',
-            'SILENCE_THRESHOLD': 'Silence threshold',
-            'MIN_AUDIO_LENGTH': 'Minimum audio length',
-            'MAX_SILENCE_DURATION': 'Maximum silence duration',
-            'TTS_VOICE': 'Text-to-speech voice',
-            'TTS_MODEL': 'Text-to-speech model',
-            'DEBUG': 'Debug mode',
-            'LOG_LEVEL': 'Logging level',
-            'PORT': 'Application port',
-            'ENVIRONMENT': 'Environment type',
-            'PROBE_LIMIT': 'Probe limit',
-            'MAX_CONVERSATION_HISTORY': 'Maximum conversation history'
-        }
-        
-        missing_vars = []
-        for var, description in required_vars.items():
-            if getattr(cls, var) is None:
-                missing_vars.append(f"{description} ({var})")
-        
+        missing_vars = [
+            f"{f.metadata['description']} ({f.name})"
+            for f in fields(self)
+            if f.init and getattr(self, f.name) is None
+        ]
+
         if missing_vars:
             raise ValueError(
                 "Missing required environment variables:\n" +
@@ -102,23 +111,19 @@ class Config:
             )
 
         # Validate value constraints
-        if cls.AI_MODEL not in ['AnthropicAI', 'OpenAI']:
+        if self.AI_MODEL not in ['AnthropicAI', 'OpenAI']:
             raise ValueError("AI_MODEL must be either 'AnthropicAI' or 'OpenAI'")
-            
-        if cls.DEBUG.lower() not in ['true', 'false']:
+
+        if self.DEBUG.lower() not in ['true', 'false']:
             raise ValueError("DEBUG must be either 'True' or 'False'")
-            
-        if not os.path.exists(cls.GOOGLE_APPLICATION_CREDENTIALS):
-            raise ValueError(f"Google credentials file not found at: {cls.GOOGLE_APPLICATION_CREDENTIALS}")
-    
-    @classmethod
-    def get_websocket_url(cls, access_token: str) -> str:
+
+        if not os.path.exists(self.GOOGLE_APPLICATION_CREDENTIALS):
+            raise ValueError(f"Google credentials file not found at: {self.GOOGLE_APPLICATION_CREDENTIALS}")
+
+    def get_websocket_url(self, access_token: str) -> str:
         """Generate WebSocket URL with access token"""
-        return (
-            f"wss://{cls.HUME_API_HOST}/v0/evi/chat?"
-            f"access_token={access_token}&config_id={cls.HUME_CONFIG_ID}"
-        )
-    
+        return self._ws_prefix + access_token + self._ws_suffix
+
     @classmethod
     def setup_directories(cls):
         """Create necessary application directories"""
@@ -126,6 +131,7 @@ class Config:
         for directory in directories:
             directory.mkdir(parents=True, exist_ok=True)
 
-# Initialize important settings on import
-Config.validate_config()
-Config.setup_directories()
\ No newline at end of file
+# Build and validate settings once on import
+CONFIG = Config.from_env()
+CONFIG.validate_config()
+Config.setup_directories()
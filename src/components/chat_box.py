@@ -1,59 +1,145 @@
 import streamlit as st
 import logging
+import html
+import itertools
+import markdown
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import List, Optional, Tuple
+
+@dataclass(slots=True)
+class Message:
+    """A single chat turn as stored in session state"""
+    role: str
+    content: str
+    timestamp: str
+    timestamp_display: str
+    id: str
+    emotions: Tuple[tuple, ...] = ()
+
+@st.cache_data
+def emotions_html(emotions: Tuple[tuple, ...]) -> str:
+    """Render emotion scores as a collapsible block of CSS progress bars"""
+    rows = "".join(
+        f'<div class="emotion-bar">'
+        f'<div class="emotion-label"><span>{html.escape(emotion.capitalize())}</span><span>{score:.2%}</span></div>'
+        f'<div class="emotion-bar-track"><div class="emotion-bar-fill" style="width:{score * 100:.1f}%"></div></div>'
+        f'</div>'
+        for emotion, score in emotions
+    )
+    return (
+        '<details class="emotion-expander">'
+        '<summary class="emotion-header">View emotions</summary>'
+        f'<div class="emotion-content">{rows}</div>'
+        '</details>'
+    )
+
+@st.cache_data(max_entries=1024)
+def content_html(content: str) -> str:
+    """Render message markdown to HTML once, escaping any raw HTML in the text first"""
+    return markdown.markdown(html.escape(content, quote=False))
+
+@st.cache_data(max_entries=256)
+def _render_static_history(payload: Tuple[tuple, ...]) -> str:
+    """Render older messages as one HTML block of (role, content, time, emotions) rows"""
+    rows = []
+    for role, content, timestamp_display, emotions in payload:
+        row = f'<div class="chat-message {role}-message">{content_html(content)}'
+        if emotions:
+            row += emotions_html(emotions)
+        if timestamp_display:
+            row += f'<div class="message-timestamp">Sent at {timestamp_display}</div>'
+        rows.append(row + '</div>')
+    return f'<div class="chat-history">{"".join(rows)}</div>'
+
+def _render_tail(chat_box: "ChatBox", messages: Tuple[Message, ...]) -> None:
+    """Render the most recent messages with full Streamlit chat widgets"""
+    for message in messages:
+        # Stable per-message keys let the frontend append instead of re-reconciling
+        with st.container(key=message.id), st.chat_message(message.role):
+            # Same renderer as the static history, so a message looks identical in both
+            st.markdown(content_html(message.content), unsafe_allow_html=True)
+            if message.emotions:
+                chat_box._display_emotions(message.emotions)
+            st.caption(f"Sent at {message.timestamp_display}")
+
+@st.fragment
+def _render_chat(chat_box: "ChatBox", messages_snapshot: Tuple[Message, ...]) -> None:
+    """Render chat history as a fragment so its reruns stay scoped to the chat area"""
+    split = max(len(messages_snapshot) - chat_box.TAIL_MESSAGES, 0)
+    history, tail = messages_snapshot[:split], messages_snapshot[split:]
+
+    if history:
+        # Keyed on content rather than IDs, since the cache is shared across sessions
+        payload = tuple(
+            (message.role, message.content, message.timestamp_display, message.emotions)
+            for message in history
+        )
+        st.markdown(_render_static_history(payload), unsafe_allow_html=True)
+
+    _render_tail(chat_box, tail)
 
 class ChatBox:
     def __init__(self):
         """Initialize the chat box component with proper state management"""
         self.logger = logging.getLogger(__name__)
         self.MAX_MESSAGES = 50
+        self.TAIL_MESSAGES = 3
         self._initialize_session_state()
 
     def _initialize_session_state(self) -> None:
         """Initialize or verify session state"""
         try:
             if "messages" not in st.session_state:
-                st.session_state.messages = [{
-                    "role": "assistant",
-                    "content": "Hello, welcome to TAFEP! How may I assist you today?",
-                    "timestamp": datetime.now().isoformat(),
-                    "id": "initial-message"
-                }]
+                st.session_state.messages = deque(
+                    [self._create_initial_message()], maxlen=self.MAX_MESSAGES
+                )
+            elif not isinstance(st.session_state.messages, deque):
+                st.session_state.messages = deque(
+                    st.session_state.messages, maxlen=self.MAX_MESSAGES
+                )
+            if "_msg_counter" not in st.session_state:
+                st.session_state._msg_counter = itertools.count()
         except Exception as e:
-            self.logger.error(f"Failed to initialize session state: {e}")
+            self.logger.error("Failed to initialize session state: %s", e)
             raise
 
+    def _create_message(self, role: str, content: str, message_id: str,
+                        emotions: Tuple[tuple, ...] = ()) -> Message:
+        """Build a message stamped with the current time"""
+        now = datetime.now()
+        return Message(
+            role=role,
+            content=content,
+            timestamp=now.isoformat(),
+            timestamp_display=now.strftime('%I:%M %p'),
+            id=message_id,
+            emotions=emotions
+        )
+
+    def _create_initial_message(self) -> Message:
+        """Build the assistant greeting that opens every chat"""
+        return self._create_message(
+            "assistant",
+            "Hello, welcome to TAFEP! How may I assist you today?",
+            "initial-message"
+        )
+
     def display_messages(self) -> None:
         """Display chat messages with error handling"""
         try:
-            for message in st.session_state.messages:
-                with st.chat_message(message["role"]):
-                    st.write(message["content"])
-                    if "emotions" in message and message["emotions"]:
-                        self._display_emotions(message["emotions"])
-                    if "timestamp" in message:
-                        st.caption(
-                            f"Sent at {datetime.fromisoformat(message['timestamp']).strftime('%I:%M %p')}"
-                        )
+            _render_chat(self, tuple(st.session_state.messages))
         except Exception as e:
-            self.logger.error(f"Error displaying messages: {e}")
+            self.logger.error("Error displaying messages: %s", e)
             st.error("Error displaying chat history. Please refresh the page.")
 
-    def _display_emotions(self, emotions: List[tuple]) -> None:
-        """Display emotion analysis with validation"""
+    def _display_emotions(self, emotions: Tuple[tuple, ...]) -> None:
+        """Display pre-validated emotion analysis"""
         try:
-            with st.expander("View emotions"):
-                for emotion, score in emotions:
-                    if not isinstance(score, (int, float)) or not 0 <= score <= 1:
-                        self.logger.warning(f"Invalid emotion score: {score}")
-                        continue
-                    st.progress(
-                        score,
-                        text=f"{emotion.capitalize()}: {score:.2%}"
-                    )
+            st.markdown(emotions_html(emotions), unsafe_allow_html=True)
         except Exception as e:
-            self.logger.error(f"Error displaying emotions: {e}")
+            self.logger.error("Error displaying emotions: %s", e)
 
     def add_message(self, role: str, content: str, emotions: Optional[List[tuple]] = None) -> bool:
         """Add message with validation and error handling"""
@@ -61,68 +147,60 @@ class ChatBox:
             if not self._validate_message(role, content):
                 return False
 
-            message = {
-                "role": role,
-                "content": content.strip(),
-                "timestamp": datetime.now().isoformat(),
-                "id": f"msg-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
-            }
-
-            if emotions:
-                message["emotions"] = self._validate_emotions(emotions)
-
-            if len(st.session_state.messages) >= self.MAX_MESSAGES:
-                st.session_state.messages.pop(0)
+            message = self._create_message(
+                role,
+                content.strip(),
+                f"msg-{next(st.session_state._msg_counter)}",
+                self._validate_emotions(emotions) if emotions else ()
+            )
 
             st.session_state.messages.append(message)
             return True
 
         except Exception as e:
-            self.logger.error(f"Error adding message: {e}")
+            self.logger.error("Error adding message: %s", e)
             return False
 
     def _validate_message(self, role: str, content: str) -> bool:
         """Validate message inputs"""
         if role not in ["user", "assistant"]:
-            self.logger.error(f"Invalid message role: {role}")
+            self.logger.error("Invalid message role: %s", role)
             return False
         if not content or not content.strip():
             self.logger.error("Empty message content")
             return False
         return True
 
-    def _validate_emotions(self, emotions: List[tuple]) -> List[tuple]:
-        """Validate emotion data"""
-        return [
-            (emotion, score) for emotion, score in emotions
-            if isinstance(score, (int, float)) and 0 <= score <= 1
-        ]
+    def _validate_emotions(self, emotions: List[tuple]) -> Tuple[tuple, ...]:
+        """Validate emotion data and normalize it to (lowercase label, score in [0, 1])"""
+        return tuple(
+            (str(emotion).lower(), min(max(float(score), 0.0), 1.0))
+            for emotion, score in emotions
+            if isinstance(score, (int, float))
+        )
 
     def clear_chat(self) -> None:
         """Clear chat history safely"""
         try:
-            st.session_state.messages = [{
-                "role": "assistant",
-                "content": "Hello, welcome to TAFEP! How may I assist you today?",
-                "timestamp": datetime.now().isoformat(),
-                "id": "initial-message"
-            }]
+            st.session_state.messages = deque(
+                [self._create_initial_message()], maxlen=self.MAX_MESSAGES
+            )
         except Exception as e:
-            self.logger.error(f"Error clearing chat: {e}")
+            self.logger.error("Error clearing chat: %s", e)
             st.error("Failed to clear chat history")
 
-    def get_last_message(self) -> Optional[Dict[str, Any]]:
+    def get_last_message(self) -> Optional[Message]:
         """Get last message safely"""
         try:
             return st.session_state.messages[-1] if st.session_state.messages else None
         except Exception as e:
-            self.logger.error(f"Error retrieving last message: {e}")
+            self.logger.error("Error retrieving last message: %s", e)
             return None
 
-    def get_chat_history(self) -> List[Dict[str, Any]]:
+    def get_chat_history(self) -> List[Message]:
         """Get chat history safely"""
         try:
             return list(st.session_state.messages)
         except Exception as e:
-            self.logger.error(f"Error retrieving chat history: {e}")
+            self.logger.error("Error retrieving chat history: %s", e)
             return []
\ No newline at end of file
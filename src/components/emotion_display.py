@@ -10,14 +10,13 @@ class EmotionDisplay:
         self.MAX_EMOTIONS = 5
 
     def display(self, emotions: List[tuple]) -> None:
-        """Display emotions with proper validation and error handling"""
+        """Display normalized emotions with error handling"""
         if not emotions:
             return
 
         try:
-            # Validate and limit emotions
-            valid_emotions = self._validate_emotions(emotions)
-            display_emotions = valid_emotions[:self.MAX_EMOTIONS]
+            # Emotions arrive normalized from ChatBox, so only limit them
+            display_emotions = emotions[:self.MAX_EMOTIONS]
 
             # Create columns and display emotions
             cols = st.columns(len(display_emotions))
@@ -26,18 +25,7 @@ class EmotionDisplay:
                     self._display_emotion_metric(emotion, score)
 
         except Exception as e:
-            self.logger.error(f"Error displaying emotions: {e}")
-
-    def _validate_emotions(self, emotions: List[tuple]) -> List[tuple]:
-        """Validate emotion data"""
-        valid_emotions = []
-        for emotion, score in emotions:
-            try:
-                if isinstance(score, (int, float)) and 0 <= score <= 1:
-                    valid_emotions.append((emotion.lower(), float(score)))
-            except (ValueError, TypeError):
-                self.logger.warning(f"Invalid emotion data: {emotion}, {score}")
-        return valid_emotions
+            self.logger.error("Error displaying emotions: %s", e)
 
     def _display_emotion_metric(self, emotion: str, score: float) -> None:
         """Display single emotion metric"""
@@ -48,4 +36,4 @@ class EmotionDisplay:
                 delta=None,
             )
         except Exception as e:
-            self.logger.error(f"Error displaying emotion metric: {e}")
\ No newline at end of file
+            self.logger.error("Error displaying emotion metric: %s", e)
\ No newline at end of file
@@ -1,9 +1,64 @@
-from audio_recorder_streamlit import audio_recorder
+from streamlit_webrtc import webrtc_streamer, WebRtcMode
 import streamlit as st
+import av
+import hashlib
 import logging
-from typing import Optional
-from datetime import datetime
-from typing import List, Optional, Tuple
+import queue
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from config import CONFIG
+from src.utils.helpers import run_async
+
+class _UtteranceBuffer:
+    """Collects WebRTC audio frames and cuts them into utterances on silence"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames = deque()
+        # Completed utterances, handed from the WebRTC worker thread to the script thread
+        self._utterances = queue.SimpleQueue()
+        self._voiced_seconds = 0.0
+        self._silence_seconds = 0.0
+        # Deliver PCM in the layout and rate SpeechToText expects
+        self._resampler = av.AudioResampler(
+            format="s16",
+            layout="stereo" if CONFIG.CHANNELS == 2 else "mono",
+            rate=CONFIG.SAMPLE_RATE
+        )
+
+    def on_frame(self, frame: av.AudioFrame) -> av.AudioFrame:
+        """WebRTC worker-thread callback; buffers voiced audio until a pause"""
+        for resampled in self._resampler.resample(frame):
+            samples = resampled.to_ndarray()
+            duration = resampled.samples / resampled.sample_rate
+            peak = max(int(samples.max()), -int(samples.min()))
+
+            with self._lock:
+                if peak >= CONFIG.SILENCE_THRESHOLD:
+                    self._voiced_seconds += duration
+                    self._silence_seconds = 0.0
+                elif self._frames:
+                    self._silence_seconds += duration
+                else:
+                    continue  # Skip leading silence
+
+                self._frames.append(samples.tobytes())
+
+                if self._silence_seconds >= CONFIG.MAX_SILENCE_DURATION:
+                    if self._voiced_seconds >= CONFIG.MIN_AUDIO_LENGTH:
+                        self._utterances.put(b"".join(self._frames))
+                    self._frames.clear()
+                    self._voiced_seconds = 0.0
+                    self._silence_seconds = 0.0
+        return frame
+
+    def pop_utterance(self, timeout: float) -> Optional[bytes]:
+        """Wait up to timeout seconds for the oldest completed utterance as raw PCM"""
+        try:
+            return self._utterances.get(timeout=timeout)
+        except queue.Empty:
+            return None
 
 class AudioRecorder:
     def __init__(self, chat_box, conversation_handler, speech_to_text):
@@ -19,55 +74,119 @@ class AudioRecorder:
         self.chat_box = chat_box
         self.conversation_handler = conversation_handler
         self.speech_to_text = speech_to_text
-        self.is_processing = False
+
+        # Recorder is rebuilt on every rerun, so the processing guard lives in session state
+        st.session_state.setdefault("_audio_processing", False)
+        if "_audio_lock" not in st.session_state:
+            st.session_state._audio_lock = threading.Lock()
+
+    @property
+    def is_processing(self) -> bool:
+        """Whether a recording from this session is currently being processed"""
+        return st.session_state._audio_processing
 
     def record(self) -> Optional[bytes]:
-        """Record audio with error handling"""
+        """Stream microphone audio and return the next complete utterance as raw PCM"""
         try:
-            return audio_recorder(
-                pause_threshold=2.0,
-                icon_size="2x",
-                recording_color="#e21e1e",
-                neutral_color="#0096db"
+            if "_utterance_buffer" not in st.session_state:
+                st.session_state._utterance_buffer = _UtteranceBuffer()
+            buffer = st.session_state._utterance_buffer
+            ctx = webrtc_streamer(
+                key="rec",
+                mode=WebRtcMode.SENDONLY,
+                audio_frame_callback=buffer.on_frame,
+                media_stream_constraints={"audio": True, "video": False}
             )
+
+            # Frames arrive on a worker thread; block on its queue so a finished
+            # utterance wakes us immediately. ctx.state is a snapshot for this run, so
+            # between waits check that the WebRTC worker is still alive and touch a
+            # placeholder: Streamlit only stops or reruns a script at an st call, which
+            # is how STOP or a closed tab ends this loop. The long wait keeps that to
+            # one delta per second while the mic is open.
+            # _get_worker() is private to streamlit-webrtc (pinned to 0.47.7 in
+            # requirements.txt); the public context exposes no live worker state in
+            # SENDONLY mode, so recheck this call when upgrading.
+            heartbeat = st.empty()
+            while ctx.state.playing and ctx._get_worker() is not None:
+                utterance = buffer.pop_utterance(timeout=1.0)
+                if utterance:
+                    return utterance
+                heartbeat.empty()
+            return None
         except Exception as e:
-            self.logger.error(f"Recording error: {e}")
+            self.logger.error("Recording error: %s", e)
             st.error("Error initializing audio recorder")
             return None
 
+    async def _process_async(self, audio_bytes: bytes, conversation_repository: List,
+                             conversation_state: Dict) -> Optional[Tuple[str, List[tuple], str]]:
+        """Run transcription and response generation on the background event loop"""
+        # Get transcript and emotions from speech service
+        result = await self.speech_to_text.transcribe_audio_async(audio_bytes)
+        if not result:
+            self.logger.warning("Transcription returned no result")
+            return None
+
+        transcript, emotions = result
+        if not transcript:
+            return None
+
+        # Generate bot response with emotions
+        bot_response = await self.conversation_handler.generate_response(
+            transcript,
+            emotions,
+            conversation_repository,
+            conversation_state
+        )
+        return transcript, emotions, bot_response
+
     def process_recording(self, audio_bytes: bytes) -> None:
         if not audio_bytes or self.is_processing:
             return
 
+        # Guard against the same clip being handed over twice
+        audio_hash = hashlib.blake2b(audio_bytes, digest_size=16).digest()
+        if st.session_state.get("_last_audio_hash") == audio_hash:
+            return
+
+        lock = st.session_state._audio_lock
+        if not lock.acquire(blocking=False):
+            return
+
+        # CSS-only indicator instead of an st.spinner widget
+        indicator = st.empty()
         try:
-            self.is_processing = True
-            with st.spinner("Processing your message..."):
-                # Get transcript and emotions from speech service
-                result = self.speech_to_text.transcribe_audio(audio_bytes)
-                
-                if result:
-                    transcript, emotions = result
-                    
-                    # Add user message
-                    self.chat_box.add_message(
-                        role="user",
-                        content=transcript,
-                        emotions=emotions
-                    )
+            st.session_state._audio_processing = True
+            st.session_state._last_audio_hash = audio_hash
+            indicator.markdown(
+                '<div class="processing-spinner"><div class="processing"></div>'
+                'Processing your message...</div>',
+                unsafe_allow_html=True
+            )
+            result = run_async(self._process_async(
+                audio_bytes,
+                self.chat_box.get_chat_history(),
+                self.conversation_handler.get_conversation_state()
+            ))
 
-                    # Generate and add bot response with emotions
-                    bot_response = self.conversation_handler.generate_response(
-                        transcript,
-                        emotions
+            if result:
+                transcript, emotions, bot_response = result
+                self.chat_box.add_message(
+                    role="user",
+                    content=transcript,
+                    emotions=emotions
+                )
+                if bot_response:
+                    self.chat_box.add_message(
+                        role="assistant",
+                        content=bot_response
                     )
-                    if bot_response:
-                        self.chat_box.add_message(
-                            role="assistant",
-                            content=bot_response
-                        )
 
         except Exception as e:
-            self.logger.error(f"Error processing recording: {e}")
+            self.logger.error("Error processing recording: %s", e)
             st.error("Error processing your message. Please try again.")
         finally:
-            self.is_processing = False
\ No newline at end of file
+            indicator.empty()
+            st.session_state._audio_processing = False
+            lock.release()
\ No newline at end of file
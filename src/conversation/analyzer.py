@@ -1,165 +1,240 @@
 # analyzer.py
 import openai
 import anthropic
+import asyncio
+import httpx
 import logging
-import os
-from config import Config
-from typing import List, Dict, Optional
+from config import CONFIG
+from .consent import requests_filing
+from .response_cache import ResponseCache
+from typing import AsyncIterator, List, Dict
+
+# Static instructions go first (as the system prompt) so providers can reuse the cached
+# prefix across turns; per-turn content is sent last in the user message.
+ADVISOR_SYSTEM_PROMPT = "You are a professional TAFEP advisor speaking directly to users via voice chat. Use concise, clear language and show empathy."
+
+EMOTION_SYSTEM_PROMPT = """
+<system>You are analyzing emotions detected in a user's voice to adjust the response tone appropriately.</system>
+
+<task>
+Based on these emotions, suggest one SHORT phrase for how to modify the response tone.
+Examples: "be more empathetic", "remain calm and professional", "show more concern"
+</task>
+"""
+
+EMOTION_TEMPLATE = """
+<emotions>
+{emotions}
+</emotions>
+"""
 
 class ConversationAnalyzer:
     def __init__(self):
         """Initialize the conversation analyzer with selected AI model"""
         self.logger = logging.getLogger(__name__)
-        self.ai_provider = Config.AI_MODEL
+        self.ai_provider = CONFIG.AI_MODEL
+        
+        # One pooled HTTP/2 connection set shared by every API call, so concurrent
+        # sessions multiplex over warm connections instead of new TLS handshakes
+        self.http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=CONFIG.MAX_CONCURRENT_LLM)
+        )
+        # Bound in-flight completions across all sessions sharing this analyzer
+        self._llm_slots = asyncio.Semaphore(CONFIG.MAX_CONCURRENT_LLM)
         
         # Initialize appropriate client based on config
         if self.ai_provider == "OpenAI":
-            openai.api_key = Config.OPENAI_API_KEY
-            self.client = openai.chat.completions
+            self.client = openai.AsyncOpenAI(api_key=CONFIG.OPENAI_API_KEY, http_client=self.http_client)
+            self.model = "gpt-4"
         elif self.ai_provider == "AnthropicAI":
-            self.client = anthropic.Anthropic(api_key=Config.ANTHROPIC_API_KEY)
+            self.client = anthropic.AsyncAnthropic(api_key=CONFIG.ANTHROPIC_API_KEY, http_client=self.http_client)
+            self.model = CONFIG.AI_MODEL_VERSION
         else:
             raise ValueError(f"Unsupported AI provider: {self.ai_provider}")
-    
-    def _get_openai_prompt(self, user_input, conversation_repository, conversation_state):
-        """Generate OpenAI-style prompt"""
-        return f"""
-        You are a professional TAFEP digital advisor. 
-        User input: "{user_input}"
-        Conversation history: {conversation_repository}
-        Current states:
-        - Issue Established: {'Yes' if conversation_state['issue_established'] else 'No'}
-        - Discrimination Type Categorized: {'Yes' if conversation_state['discrimination_type_categorized'] else 'No'}
-        - Probe Count: {conversation_state['probe_counter']}
-        - Probing Completed: {'Yes' if conversation_state['probing_completed'] else 'No'}
-
-        Determine the next action category:
-        1. "Establish Issue" (if issue not established)
-        2. "Categorize Discrimination Type" (if issue established but type not categorized)
-        3. "Probe for Further Information" (if more details needed)
-        4. "Ask About Filing Case" (if ready to file)
-        5. "Closure Conversation" (if case filed)
-        """
 
-    def _get_anthropic_prompt(self, user_input, conversation_repository, conversation_state):
-        """Generate Claude-style prompt with XML tags"""
-        return f"""
-        <system>You are a TAFEP digital advisor tasked with analyzing conversations about workplace discrimination. You must respond with exactly one of these categories and nothing else:
-        - "Establish Issue"
-        - "Categorize Discrimination Type"
-        - "Probe for Further Information"
-        - "Ask About Filing Case"
-        - "Closure Conversation"
-        </system>
-
-        <context>
-        <conversation>
-        <input>{user_input}</input>
-        <history>{conversation_repository}</history>
-        </conversation>
-
-        <state>
-        <issue_established>{conversation_state['issue_established']}</issue_established>
-        <discrimination_categorized>{conversation_state['discrimination_type_categorized']}</discrimination_categorized>
-        <probe_count>{conversation_state['probe_counter']}</probe_count>
-        <probing_completed>{conversation_state['probing_completed']}</probing_completed>
-        </state>
-        </context>
-
-        <rules>
-        - If issue is not established, respond with "Establish Issue"
-        - If issue is established but discrimination type not categorized, respond with "Categorize Discrimination Type"
-        - If more information is needed and probe count is below limit, respond with "Probe for Further Information"
-        - If sufficient information gathered, respond with "Ask About Filing Case"
-        - If case is filed, respond with "Closure Conversation"
-        </rules>
-        """
+        self.response_cache = ResponseCache()
 
-    def analyze_user_input(self, user_input: str, conversation_repository: List, conversation_state: Dict) -> str:
+        # Bind the provider-specific implementations once instead of branching per call
+        if self.ai_provider == "OpenAI":
+            self._generate_impl = self._generate_openai_response
+            self._stream_impl = self._stream_openai_response
+        else:
+            self._generate_impl = self._generate_anthropic_response
+            self._stream_impl = self._stream_anthropic_response
+    
+    def analyze_user_input(self, user_input: str, conversation_state: Dict) -> str:
         """
-        Analyze user input and determine next action
+        Determine the next action from the conversation state
+        
+        The state flags decide every category except probing versus filing. Filing is
+        reached once probing is complete, while the filing question awaits an answer,
+        or when the user explicitly asks to file.
         
         Args:
             user_input (str): User's message
-            conversation_repository (list): Conversation history
             conversation_state (dict): Current conversation state
             
         Returns:
             str: Next action category
         """
-        try:
-            # Get appropriate prompt based on AI provider
-            if self.ai_provider == "OpenAI":
-                prompt = self._get_openai_prompt(user_input, conversation_repository, conversation_state)
-            else:  # AnthropicAI
-                prompt = self._get_anthropic_prompt(user_input, conversation_repository, conversation_state)
-                
-            # Generate response
-            response = self.generate_ai_response(prompt)
-            return response.strip()
-            
-        except Exception as e:
-            self.logger.error(f"Error analyzing user input: {e}")
-            return "Error"
+        if conversation_state.get("user_agreed_to_file_case"):
+            return "Closure Conversation"
+        if not conversation_state["issue_established"]:
+            return "Establish Issue"
+        if not conversation_state["discrimination_type_categorized"]:
+            return "Categorize Discrimination Type"
+        if (conversation_state["probing_completed"]
+                or conversation_state.get("filing_offered")
+                or requests_filing(user_input)):
+            return "Ask About Filing Case"
+        return "Probe for Further Information"
 
-    def generate_ai_response(self, prompt: str) -> str:
+    async def generate_ai_response(self, prompt: str, system: str = ADVISOR_SYSTEM_PROMPT,
+                                   cacheable: bool = False) -> str:
         """
         Generate response using selected AI model
         
         Args:
-            prompt (str): Prompt for AI model
+            prompt (str): Per-turn prompt for AI model
+            system (str): Static instructions, sent first so the prefix can be cached
+            cacheable (bool): Whether a cached response for an identical prompt may be reused.
+                The cache is shared by every session, so only prompts that carry no user data
+                may set this
             
         Returns:
             str: AI generated response
         """
         try:
-            if self.ai_provider == "OpenAI":
-                return self._generate_openai_response(prompt)
-            else:
-                return self._generate_anthropic_response(prompt)
+            if not cacheable:
+                return await self._generate_impl(prompt, system)
+
+            cached = self.response_cache.lookup(self.model, system, prompt)
+            if cached is not None:
+                return cached
+
+            response = await self._generate_impl(prompt, system)
+            self.response_cache.store(self.model, system, prompt, response)
+            return response
         except Exception as e:
-            self.logger.error(f"Error generating AI response: {e}")
+            self.logger.error("Error generating AI response: %s", e)
             return "Error"
             
-    def _generate_openai_response(self, prompt: str) -> str:
-        """Generate response using OpenAI"""
+    async def stream_ai_response(self, prompt: str, system: str = ADVISOR_SYSTEM_PROMPT) -> AsyncIterator[str]:
+        """
+        Stream response text from the selected AI model as it is generated
+        
+        Args:
+            prompt (str): Per-turn prompt for AI model
+            system (str): Static instructions, sent first so the prefix can be cached
+            
+        Yields:
+            str: Response text deltas
+
+        Raises:
+            Exception: Any provider error, including one after some deltas were yielded
+        """
         try:
-            response = self.client.create(
-                model="gpt-4",
+            async for chunk in self._stream_impl(prompt, system):
+                yield chunk
+        except Exception as e:
+            # Re-raise so the caller can discard the partial reply
+            self.logger.error("Error streaming AI response: %s", e)
+            raise
+
+    async def _stream_openai_response(self, prompt: str, system: str) -> AsyncIterator[str]:
+        """Stream response deltas from OpenAI"""
+        async with self._llm_slots:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are a professional TAFEP advisor speaking directly to users via voice chat. Use concise, clear language and show empathy."
+                        "content": system
                     },
                     {
                         "role": "user",
                         "content": prompt
                     }
-                ]
+                ],
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def _stream_anthropic_response(self, prompt: str, system: str) -> AsyncIterator[str]:
+        """Stream response deltas from Anthropic's Claude"""
+        async with self._llm_slots, self.client.messages.stream(
+            model=self.model,
+            max_tokens=1024,
+            system=[{
+                "type": "text",
+                "text": system,
+                "cache_control": {"type": "ephemeral"}
+            }],
+            messages=[{
+                "role": "user",
+                "content": prompt
+            }]
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+    async def _generate_openai_response(self, prompt: str, system: str) -> str:
+        """Generate response using OpenAI"""
+        try:
+            async with self._llm_slots:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": system
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ]
+                )
+            details = getattr(response.usage, "prompt_tokens_details", None)
+            self.logger.debug(
+                "OpenAI prompt tokens: %s, cached: %s",
+                response.usage.prompt_tokens, getattr(details, "cached_tokens", 0)
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
-            self.logger.error(f"OpenAI error: {e}")
+            self.logger.error("OpenAI error: %s", e)
             raise
 
-    def _generate_anthropic_response(self, prompt: str) -> str:
+    async def _generate_anthropic_response(self, prompt: str, system: str) -> str:
         """Generate response using Anthropic's Claude"""
         try:
-            response = self.client.messages.create(
-                model=Config.AI_MODEL_VERSION,
-                max_tokens=1024,
-                system="You are a professional TAFEP advisor speaking directly to users via voice chat. Use concise, clear language and show empathy.",
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
+            async with self._llm_slots:
+                response = await self.client.messages.create(
+                    model=self.model,
+                    max_tokens=1024,
+                    system=[{
+                        "type": "text",
+                        "text": system,
+                        "cache_control": {"type": "ephemeral"}
+                    }],
+                    messages=[{
+                        "role": "user",
+                        "content": prompt
+                    }]
+                )
+            self.logger.debug(
+                "Anthropic cache write tokens: %s, cache read tokens: %s",
+                response.usage.cache_creation_input_tokens, response.usage.cache_read_input_tokens
             )
             return response.content[0].text
         except Exception as e:
-            self.logger.error(f"Anthropic error: {e}")
+            self.logger.error("Anthropic error: %s", e)
             raise
 
-    def analyze_emotion(self, emotions: List[tuple]) -> str:
+    async def analyze_emotion(self, emotions: List[tuple]) -> str:
         """
         Analyze detected emotions and generate appropriate response modifier
         
@@ -174,22 +249,15 @@ class ConversationAnalyzer:
             
         try:
             # Create prompt for emotion analysis
-            emotion_prompt = f"""
-            <system>You are analyzing emotions detected in a user's voice to adjust the response tone appropriately.</system>
-            
-            <emotions>
-            {', '.join([f'{emotion}: {score:.2%}' for emotion, score in emotions])}
-            </emotions>
-            
-            <task>
-            Based on these emotions, suggest one SHORT phrase for how to modify the response tone.
-            Examples: "be more empathetic", "remain calm and professional", "show more concern"
-            </task>
-            """
+            # Scores are bucketed to the nearest 10% so recurring emotion mixes hit the cache
+            emotion_prompt = EMOTION_TEMPLATE.format_map({
+                "emotions": ", ".join(f"{emotion}: {round(score, 1):.0%}" for emotion, score in emotions)
+            })
             
-            response = self.generate_ai_response(emotion_prompt)
+            # Emotion names and scores only, so the guidance is safe to share across sessions
+            response = await self.generate_ai_response(emotion_prompt, system=EMOTION_SYSTEM_PROMPT, cacheable=True)
             return response.strip()
             
         except Exception as e:
-            self.logger.error(f"Error analyzing emotions: {e}")
+            self.logger.error("Error analyzing emotions: %s", e)
             return ""
\ No newline at end of file
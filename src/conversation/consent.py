@@ -0,0 +1,23 @@
+# consent.py
+import re
+
+# Plain affirmatives only; "please", "file" and "agree" also appear in refusals
+AFFIRM_PATTERN = re.compile(r"\b(yes|yeah|yep|sure|okay|ok|go ahead)\b", re.IGNORECASE)
+
+# Explicit requests to file, e.g. "I want to file a complaint"; a bare "yes" or "report" is not one
+FILING_PATTERN = re.compile(
+    r"\b(want|like|wish|ready|going|need)\s+to\s+(file|lodge|submit|report)\b"
+    r"|\b(file|lodge|submit|make)\s+(a|the|my|this)\s+(case|complaint|report)\b",
+    re.IGNORECASE
+)
+
+# Any negation vetoes consent: "no", "not", "don't", "do not", "didn't", ...
+NEGATION_PATTERN = re.compile(r"\b(no|nope|not|never|don['’]?t)\b|n['’]t\b", re.IGNORECASE)
+
+def is_consent(user_input: str) -> bool:
+    """Check whether a reply agrees to filing: an affirmative with no negation anywhere"""
+    return AFFIRM_PATTERN.search(user_input) is not None and NEGATION_PATTERN.search(user_input) is None
+
+def requests_filing(user_input: str) -> bool:
+    """Check whether the user explicitly asks to file a case, without negating it"""
+    return FILING_PATTERN.search(user_input) is not None and NEGATION_PATTERN.search(user_input) is None
@@ -1,214 +1,423 @@
 # handler.py
+import asyncio
 import logging
+import re
 import streamlit as st
-from src.utils.helpers import normalize_string
-from .analyzer import ConversationAnalyzer
-from config import Config
-from typing import List, Optional, Dict, Tuple
+import tiktoken
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from src.utils.helpers import new_conversation_state, normalize_string
+from .analyzer import ConversationAnalyzer, ADVISOR_SYSTEM_PROMPT
+from .consent import is_consent
+from config import CONFIG
+from types import MappingProxyType
+from typing import ClassVar, List, Mapping, Optional, Dict, Tuple
+
+# Fixed task instructions, sent as the cacheable system prompt for each handler
+ESTABLISH_ISSUE_PROMPT = ADVISOR_SYSTEM_PROMPT + """
+
+Task: Establish the specific discrimination issue.
+1. Show empathy and understanding
+2. Clarify the type of discrimination
+3. Ask for specific incidents
+4. Keep response concise (max 30 words)
+"""
+
+CATEGORIZE_PROMPT = ADVISOR_SYSTEM_PROMPT + """
+
+Task: Categorize the discrimination type.
+1. Identify discrimination category (racial, gender, age, etc.)
+2. Confirm understanding
+3. Express concern appropriately
+4. Keep response concise (max 30 words)
+"""
+
+PROBE_PROMPT = ADVISOR_SYSTEM_PROMPT + """
+
+Task: Gather more details about the discrimination case.
+1. Ask about specific incidents
+2. Request dates and times
+3. Inquire about witnesses
+4. Keep response concise (max 30 words)
+"""
+
+FILE_CASE_PROMPT = ADVISOR_SYSTEM_PROMPT + """
+
+Task: Ask if they want to file a case with TAFEP.
+1. Summarize key points
+2. Explain filing process
+3. Request consent
+4. Keep response concise (max 30 words)
+"""
+
+CLOSURE_PROMPT = ADVISOR_SYSTEM_PROMPT + """
+
+Task: Close the conversation professionally.
+1. Thank the user
+2. Confirm next steps
+3. Provide TAFEP contact info
+4. Keep response concise (max 30 words)
+"""
+
+CASE_SUMMARY_PROMPT = ADVISOR_SYSTEM_PROMPT + """
+
+Create a concise summary of the conversation including:
+1. Type of discrimination
+2. Key incidents
+3. Evidence provided
+4. Timeline of events
+"""
+
+HISTORY_SUMMARY_PROMPT = """
+You maintain a running summary of a TAFEP workplace discrimination conversation.
+Merge the existing summary with the new messages into one concise summary that keeps
+the discrimination type, key incidents, dates, witnesses and any consent given.
+Respond with the summary only.
+"""
+
+# Per-turn prompt templates, filled with format_map after the cacheable system prompt
+TURN_TEMPLATE = """
+Previous conversation: {history}
+Based on: "{user_input}"
+"""
+
+PROBE_TEMPLATE = """
+Previous conversation: {history}
+Probe count: {probe_count}
+Based on: "{user_input}"
+"""
+
+FILE_CASE_TEMPLATE = """
+Based on gathered information:
+Conversation: {history}
+User input: "{user_input}"
+"""
+
+CLOSURE_TEMPLATE = """
+User input: "{user_input}"
+"""
+
+CASE_SUMMARY_TEMPLATE = """
+Based on this conversation: {history}
+"""
+
+HISTORY_SUMMARY_TEMPLATE = """
+Existing summary: {summary}
+New messages:
+{messages}
+"""
+
+TONE_TEMPLATE = "Tone guidance: {tone}\n"
+
+ERROR_REPLY = "I apologize, but I encountered an error. Could you please repeat that?"
+FILING_ERROR_REPLY = "I'm sorry, I couldn't file your case just now. Would you like me to try again?"
+
+# Split streamed text after sentence-ending punctuation followed by whitespace
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tokenizer used for history budgeting"""
+    return tiktoken.encoding_for_model("gpt-4")
+
+def format_message(message) -> str:
+    """Render one chat message as a compact role: content line"""
+    return f"{message.role}: {message.content}"
+
+def format_messages(messages: List) -> str:
+    """Render chat messages as compact role: content lines"""
+    return "\n".join(map(format_message, messages))
+
+@lru_cache(maxsize=1024)
+def count_tokens(text: str) -> int:
+    """Count tokens in text; memoized since each history line is recounted every turn"""
+    return len(_get_encoding().encode(text))
+
+def count_message_tokens(messages: List) -> int:
+    """Approximate the tokens of format_messages(messages) from per-line counts"""
+    return sum(count_tokens(format_message(message)) for message in messages) + len(messages)
 
 class ConversationHandler:
+    # Normalized category -> handler method name, built once at class definition
+    _HANDLERS: ClassVar[Mapping[str, str]] = MappingProxyType({
+        "establishissue": "_establish_issue",
+        "categorizediscriminationtype": "_categorize_discrimination",
+        "probeforfurtherinformation": "_probe_further_information",
+        "askaboutfilingcase": "_ask_to_file_case",
+        "closureconversation": "_closure_conversation"
+    })
+
     def __init__(self, tts_service):
         """Initialize conversation handler"""
         self.logger = logging.getLogger(__name__)
         self.analyzer = ConversationAnalyzer()
         self.tts_service = tts_service
+        # Speech is synthesized and played by workers on the background loop; the
+        # reply is returned while it is still being spoken
+        self._tts_queue: Optional[asyncio.Queue] = None
+        self._audio_queue: Optional[asyncio.Queue] = None
+        self._tts_workers: Tuple[asyncio.Task, ...] = ()
+        # One thread each for synthesis and playback, kept apart from the default
+        # executor that audio encoding uses
+        self._tts_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tts")
+
+    async def generate_response(self, user_input: str, emotions: List[tuple],
+                                conversation_repository: List, conversation_state: Dict) -> str:
+        """
+        Generate the reply to a user turn, queueing it for speech
 
-    def handle_conversation(self, conversation_repository=None, conversation_state=None):
-        """Main conversation handling loop"""
-        if conversation_repository is None:
-            conversation_repository = []
-        if conversation_state is None:
-            conversation_state = {
-                "issue_established": False,
-                "discrimination_type_categorized": False,
-                "probe_counter": 0,
-                "probing_completed": False,
-                "user_agreed_to_file_case": False
-            }
-
-        # Initial greeting
-        introduction = "Hello, welcome to TAFEP!"
-        self.tts_service.speak_with_wavenet(introduction)
-
-    def generate_response(self, user_input: str, emotions: List[tuple] = None) -> str:
+        Runs on the background event loop, so session data is passed in rather than
+        read from st.session_state.
+
+        Args:
+            user_input (str): Transcribed user message
+            emotions (list): Detected (emotion, score) tuples
+            conversation_repository (list): Conversation history
+            conversation_state (dict): Session conversation state, updated in place
+
+        Returns:
+            str: Assistant reply
+        """
         try:
-            # Get conversation data
-            conversation_repository = self._get_conversation_repository()
-            conversation_state = self._get_conversation_state()
-            
-            # Get next action category
-            category = self.analyzer.analyze_user_input(
-                user_input,
-                conversation_repository,
-                conversation_state
+            # Build the bounded history and read the emotional tone concurrently
+            conversation_repository, tone = await asyncio.gather(
+                self._build_history_context(
+                    conversation_repository,
+                    conversation_state
+                ),
+                self.analyzer.analyze_emotion(emotions or [])
             )
-            
-            if category == "Error":
-                self.logger.error("Error determining conversation category")
-                return "I apologize, but I encountered an error. Could you please repeat that?"
+
+            category = self.analyzer.analyze_user_input(user_input, conversation_state)
+            self.logger.debug("Conversation category: %s", category)
                 
             # Get appropriate handler
             handler = self._get_handler_function(category)
             if handler:
-                response = handler(
+                response = await handler(
                     user_input,
-                    emotions,
+                    tone,
                     conversation_repository,
                     conversation_state
                 )
                 if response:
-                    self.tts_service.speak_with_wavenet(response)
                     return response
                     
-            return "I apologize, but I encountered an error. Could you please repeat that?"
+            return ERROR_REPLY
+        except Exception as e:
+            self.logger.error("Error generating response: %s", e)
+            return ERROR_REPLY
+
+    async def _build_history_context(self, conversation_repository: List, conversation_state: Dict) -> str:
+        """
+        Bound the history sent to the model by a token budget
+
+        Messages after the last summarized one form the recent window; while that window
+        exceeds CONFIG.HISTORY_TOKEN_BUDGET its oldest half is folded into the running
+        summary kept in conversation_state.
+
+        Args:
+            conversation_repository (list): Chat history messages
+            conversation_state (dict): Session conversation state, updated in place
+
+        Returns:
+            str: Summary followed by the recent messages
+        """
+        summary = conversation_state.get("history_summary", "")
+        summarized_through = conversation_state.get("summarized_through")
+        recent = list(conversation_repository)
+
+        # Ids only ever grow, so a missing marker means it has already been evicted
+        ids = [message.id for message in recent]
+        if summarized_through in ids:
+            recent = recent[ids.index(summarized_through) + 1:]
+
+        while len(recent) > 1 and count_message_tokens(recent) > CONFIG.HISTORY_TOKEN_BUDGET:
+            older, recent_tail = recent[:len(recent) // 2], recent[len(recent) // 2:]
+            prompt = HISTORY_SUMMARY_TEMPLATE.format_map({"summary": summary, "messages": format_messages(older)})
+            new_summary = await self.analyzer.generate_ai_response(
+                prompt, system=HISTORY_SUMMARY_PROMPT, cacheable=False
+            )
+            if new_summary == "Error":
+                self.logger.warning("History summarization failed, sending recent window only")
+                break
+
+            summary = new_summary.strip()
+            recent = recent_tail
+            conversation_state["history_summary"] = summary
+            conversation_state["summarized_through"] = older[-1].id
+
+        if summary:
+            return f"Summary of earlier conversation: {summary}\n{format_messages(recent)}"
+        return format_messages(recent)
+
+    def _speak(self, text: str):
+        """Queue text for speech, starting the TTS workers on first use (background loop only)"""
+        if self._tts_queue is None:
+            self._tts_queue = asyncio.Queue()
+            # Synthesis may run at most one sentence ahead of playback
+            self._audio_queue = asyncio.Queue(maxsize=1)
+            self._tts_workers = (
+                asyncio.create_task(self._synthesis_worker()),
+                asyncio.create_task(self._playback_worker())
+            )
+        self._tts_queue.put_nowait(text)
+
+    async def _synthesis_worker(self):
+        """Synthesize queued text in order, overlapping with playback of the previous sentence"""
+        while True:
+            text = await self._tts_queue.get()
+            try:
+                audio_content = await asyncio.get_running_loop().run_in_executor(
+                    self._tts_executor, self.tts_service.synthesize_with_wavenet, text
+                )
+            except Exception as e:
+                self.logger.error("Error synthesizing response: %s", e)
+                continue
+            if audio_content:
+                await self._audio_queue.put(audio_content)
+
+    async def _playback_worker(self):
+        """Play synthesized audio one item at a time so turns never wait on audio"""
+        while True:
+            audio_content = await self._audio_queue.get()
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    self._tts_executor, self.tts_service.play_audio_content, audio_content
+                )
+            except Exception as e:
+                self.logger.error("Error speaking response: %s", e)
+
+    def _say(self, text: str) -> str:
+        """Queue a complete reply for speech and return it"""
+        self._speak(text)
+        return text
+
+    async def _respond(self, prompt: str, system: str) -> str:
+        """
+        Stream a reply from the model, queueing each sentence for speech as soon as it completes
+
+        Args:
+            prompt (str): Per-turn prompt
+            system (str): Task system prompt
+
+        Returns:
+            str: Full reply text, or the spoken apology if the stream failed part-way
+        """
+        parts = []
+        buffer = ""
+        try:
+            async for chunk in self.analyzer.stream_ai_response(prompt, system=system):
+                parts.append(chunk)
+                buffer += chunk
+                *complete, buffer = SENTENCE_BOUNDARY.split(buffer)
+                for sentence in complete:
+                    self._speak(sentence)
         except Exception as e:
-            self.logger.error(f"Error generating response: {e}")
-            return "I apologize, but I encountered an error. Could you please repeat that?"
+            # Drop the unfinished sentence and keep the cut-off reply out of history
+            self.logger.error("Reply stream failed after %d chunks: %s", len(parts), e)
+            return self._say(ERROR_REPLY)
+        if buffer.strip():
+            self._speak(buffer)
+
+        return "".join(parts).strip()
+
+    def _with_tone(self, prompt: str, tone: str) -> str:
+        """Append the emotion-derived tone guidance to a handler prompt"""
+        if not tone or tone == "Error":
+            return prompt
+        return prompt + TONE_TEMPLATE.format_map({"tone": tone})
 
     def _get_handler_function(self, category):
         """Get the appropriate handler function based on category"""
-        category = normalize_string(category)
-        
-        handlers = {
-            "establishissue": self._establish_issue,
-            "categorizediscriminationtype": self._categorize_discrimination,
-            "probeforfurtherinformation": self._probe_further_information,
-            "askaboutfilingcase": self._ask_to_file_case,
-            "closureconversation": self._closure_conversation
-        }
-        
-        return handlers.get(category)
+        return getattr(self, self._HANDLERS.get(normalize_string(category), ""), None)
 
-    def _establish_issue(self, user_input, emotions, conversation_repository, conversation_state):
+    async def _establish_issue(self, user_input, tone, conversation_repository, conversation_state):
         """Handle issue establishment"""
-        prompt = f"""
-        Based on: "{user_input}"
-        Previous conversation: {conversation_repository}
+        prompt = TURN_TEMPLATE.format_map({"history": conversation_repository, "user_input": user_input})
         
-        Task: Establish the specific discrimination issue.
-        1. Show empathy and understanding
-        2. Clarify the type of discrimination
-        3. Ask for specific incidents
-        4. Keep response concise (max 30 words)
-        """
-        
-        response = self.analyzer.generate_ai_response(prompt)
+        response = await self._respond(
+            self._with_tone(prompt, tone), system=ESTABLISH_ISSUE_PROMPT
+        )
         conversation_state["issue_established"] = True
         return response
 
-    def _categorize_discrimination(self, user_input, emotions, conversation_repository, conversation_state):
+    async def _categorize_discrimination(self, user_input, tone, conversation_repository, conversation_state):
         """Handle discrimination categorization"""
-        prompt = f"""
-        Based on: "{user_input}"
-        Previous conversation: {conversation_repository}
-        
-        Task: Categorize the discrimination type.
-        1. Identify discrimination category (racial, gender, age, etc.)
-        2. Confirm understanding
-        3. Express concern appropriately
-        4. Keep response concise (max 30 words)
-        """
+        prompt = TURN_TEMPLATE.format_map({"history": conversation_repository, "user_input": user_input})
         
-        response = self.analyzer.generate_ai_response(prompt)
+        response = await self._respond(
+            self._with_tone(prompt, tone), system=CATEGORIZE_PROMPT
+        )
         conversation_state["discrimination_type_categorized"] = True
         return response
 
-    def _probe_further_information(self, user_input, emotions, conversation_repository, conversation_state):
+    async def _probe_further_information(self, user_input, tone, conversation_repository, conversation_state):
         """Handle information gathering"""
         conversation_state["probe_counter"] += 1
         
-        if conversation_state["probe_counter"] >= Config.PROBE_LIMIT:
+        if conversation_state["probe_counter"] >= CONFIG.PROBE_LIMIT:
             conversation_state["probing_completed"] = True
-            return self._ask_to_file_case(user_input, emotions, conversation_repository, conversation_state)
-        
-        prompt = f"""
-        Based on: "{user_input}"
-        Previous conversation: {conversation_repository}
-        Probe count: {conversation_state['probe_counter']}
+            return await self._ask_to_file_case(user_input, tone, conversation_repository, conversation_state)
         
-        Task: Gather more details about the discrimination case.
-        1. Ask about specific incidents
-        2. Request dates and times
-        3. Inquire about witnesses
-        4. Keep response concise (max 30 words)
-        """
+        prompt = PROBE_TEMPLATE.format_map({
+            "history": conversation_repository,
+            "probe_count": conversation_state["probe_counter"],
+            "user_input": user_input
+        })
         
-        return self.analyzer.generate_ai_response(prompt)
+        return await self._respond(
+            self._with_tone(prompt, tone), system=PROBE_PROMPT
+        )
 
-    def _ask_to_file_case(self, user_input, emotions, conversation_repository, conversation_state):
+    async def _ask_to_file_case(self, user_input, tone, conversation_repository, conversation_state):
         """Handle case filing request"""
-        if "yes" in user_input.lower():
-            return self._file_case_and_send_email(conversation_repository)
+        # Consent only counts as the answer to a filing question asked on the previous turn
+        if conversation_state.get("filing_offered") and is_consent(user_input):
+            return self._say(await self._file_case_and_send_email(conversation_repository, conversation_state))
         
-        prompt = f"""
-        Based on gathered information:
-        User input: "{user_input}"
-        Conversation: {conversation_repository}
-        
-        Task: Ask if they want to file a case with TAFEP.
-        1. Summarize key points
-        2. Explain filing process
-        3. Request consent
-        4. Keep response concise (max 30 words)
-        """
+        prompt = FILE_CASE_TEMPLATE.format_map({"history": conversation_repository, "user_input": user_input})
         
-        return self.analyzer.generate_ai_response(prompt)
+        response = await self._respond(
+            self._with_tone(prompt, tone), system=FILE_CASE_PROMPT
+        )
+        conversation_state["filing_offered"] = True
+        return response
 
-    def _closure_conversation(self, user_input, emotions, conversation_repository, conversation_state):
+    async def _closure_conversation(self, user_input, tone, conversation_repository, conversation_state):
         """Handle conversation closure"""
-        prompt = f"""
-        Task: Close the conversation professionally.
-        1. Thank the user
-        2. Confirm next steps
-        3. Provide TAFEP contact info
-        4. Keep response concise (max 30 words)
-        """
+        prompt = CLOSURE_TEMPLATE.format_map({"user_input": user_input})
         
-        return self.analyzer.generate_ai_response(prompt)
+        return await self._respond(
+            self._with_tone(prompt, tone), system=CLOSURE_PROMPT
+        )
 
-    def _file_case_and_send_email(self, conversation_repository):
-        """Handle case filing and email sending"""
+    async def _file_case_and_send_email(self, conversation_repository, conversation_state):
+        """Handle case filing and email sending; on failure the filing question stays open for a retry"""
         try:
             # Generate case summary
-            case_summary = self._generate_case_summary(conversation_repository)
+            case_summary = await self._generate_case_summary(conversation_repository)
             
-            if case_summary:
+            if case_summary and case_summary != "Error":
+                conversation_state["user_agreed_to_file_case"] = True
+                conversation_state["filing_offered"] = False
                 return "Thank you. Your case has been filed with TAFEP. You will receive a confirmation email shortly."
             else:
-                return "Error"
+                return FILING_ERROR_REPLY
                 
         except Exception as e:
-            self.logger.error(f"Error filing case: {e}")
-            return "Error"
+            self.logger.error("Error filing case: %s", e)
+            return FILING_ERROR_REPLY
 
-    def _generate_case_summary(self, conversation_repository):
+    async def _generate_case_summary(self, conversation_repository):
         """Generate summary of the case"""
-        prompt = f"""
-        Based on this conversation: {conversation_repository}
+        prompt = CASE_SUMMARY_TEMPLATE.format_map({"history": conversation_repository})
         
-        Create a concise summary including:
-        1. Type of discrimination
-        2. Key incidents
-        3. Evidence provided
-        4. Timeline of events
-        """
-        
-        return self.analyzer.generate_ai_response(prompt)
+        # Never cached: the summary goes into this user's filing email
+        return await self.analyzer.generate_ai_response(prompt, system=CASE_SUMMARY_PROMPT, cacheable=False)
 
-    def _get_conversation_state(self):
-        """Get current conversation state from session"""
+    def get_conversation_state(self):
+        """Get current conversation state from session (script thread only)"""
         if "conversation_state" not in st.session_state:
-            st.session_state.conversation_state = {
-                "issue_established": False,
-                "discrimination_type_categorized": False,
-                "probe_counter": 0,
-                "probing_completed": False,
-                "user_agreed_to_file_case": False
-            }
+            st.session_state.conversation_state = new_conversation_state()
         return st.session_state.conversation_state
-
-    def _get_conversation_repository(self):
-        """Get conversation history from session"""
-        if "messages" not in st.session_state:
-            st.session_state.messages = []
-        return st.session_state.messages
\ No newline at end of file
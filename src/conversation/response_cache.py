@@ -0,0 +1,48 @@
+# response_cache.py
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 512):
+        """Initialize the exact-match response cache"""
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries
+
+        # blake2b(model + system + prompt) -> response, in LRU order
+        self._exact: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def _key(*parts: str) -> str:
+        """Hash prompt parts into a cache key"""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def lookup(self, model: str, system: str, prompt: str) -> Optional[str]:
+        """
+        Find a cached response for exactly this prompt
+
+        Args:
+            model (str): Model the response was generated with
+            system (str): System prompt
+            prompt (str): Per-turn prompt
+
+        Returns:
+            str: Cached response, or None on a miss
+        """
+        key = self._key(model, system, prompt)
+        if key in self._exact:
+            self._exact.move_to_end(key)
+            self.logger.debug("Response cache hit")
+            return self._exact[key]
+        return None
+
+    def store(self, model: str, system: str, prompt: str, response: str):
+        """Record a generated response, evicting the least recently used one when full"""
+        self._exact[self._key(model, system, prompt)] = response
+        if len(self._exact) > self.max_entries:
+            self._exact.popitem(last=False)
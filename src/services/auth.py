@@ -1,42 +1,66 @@
+import asyncio
 import base64
-import requests
+import httpx
 import logging
-from config import Config
+import time
+from typing import Optional
+from config import CONFIG
+from src.utils.helpers import loads_json
 
 class Authenticator:
+    # Token shared by every instance in the process, with its monotonic expiry time
+    _token: Optional[str] = None
+    _expires_at: float = 0.0
+    # Refresh this many seconds before the token actually expires
+    EXPIRY_MARGIN = 30
+    # Single-flight guard shared with the token, so one refresh serves every instance
+    _refresh_lock = asyncio.Lock()
+
     def __init__(self):
-        self.logger = logging.getLogger('authenticator')
-        self.api_key = Config.HUME_API_KEY
-        self.secret_key = Config.HUME_SECRET_KEY
-        self.host = Config.HUME_API_HOST
+        self.api_key = CONFIG.HUME_API_KEY
+        self.secret_key = CONFIG.HUME_SECRET_KEY
+        self.host = CONFIG.HUME_API_HOST
         self.logger = logging.getLogger(__name__)
 
-    def fetch_access_token(self) -> str:
-        self.logger.info("Fetching access token")
-        auth_string = f"{self.api_key}:{self.secret_key}"
-        encoded = base64.b64encode(auth_string.encode()).decode()
-
-        headers = {
+        # Credentials never change, so encode them once
+        encoded = base64.b64encode(f"{self.api_key}:{self.secret_key}".encode()).decode()
+        self.headers = {
             "Content-Type": "application/x-www-form-urlencoded",
             "Authorization": f"Basic {encoded}",
+            # The token response is tiny; skip compression
+            "Accept-Encoding": "identity",
         }
-
-        data = {
+        # Using v0 endpoint
+        self.token_url = f"https://{self.host}/v0/oauth2/token"
+        self.token_request = {
             "grant_type": "client_credentials",
         }
+        # Pooled HTTP/2 client so refreshes reuse the TLS connection to Hume
+        self._client = httpx.AsyncClient(http2=True)
 
-        # Using v0 endpoint
-        response = requests.post(
-            f"https://{self.host}/v0/oauth2/token",  # Updated token endpoint
-            headers=headers, 
-            data=data
-        )
+    async def fetch_access_token(self) -> str:
+        if Authenticator._token and time.monotonic() < Authenticator._expires_at - self.EXPIRY_MARGIN:
+            return Authenticator._token
+
+        # Let a single caller refresh while concurrent callers wait for its token
+        async with Authenticator._refresh_lock:
+            if Authenticator._token and time.monotonic() < Authenticator._expires_at - self.EXPIRY_MARGIN:
+                return Authenticator._token
+
+            self.logger.info("Fetching access token")
+            response = await self._client.post(
+                self.token_url,
+                headers=self.headers,
+                data=self.token_request
+            )
 
-        data = response.json()
-        self.logger.info("Access token fetched successfully")
+            data = loads_json(response.content)
 
-        if "access_token" not in data:
-            self.logger.error("Access token not found in response")
-            raise ValueError("Access token not found in response")
+            if "access_token" not in data:
+                self.logger.error("Access token not found in response")
+                raise ValueError("Access token not found in response")
 
-        return data["access_token"]
\ No newline at end of file
+            self.logger.info("Access token fetched successfully")
+            Authenticator._token = data["access_token"]
+            Authenticator._expires_at = time.monotonic() + float(data.get("expires_in", 0))
+            return Authenticator._token
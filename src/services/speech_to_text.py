@@ -1,17 +1,29 @@
 import logging
 from typing import Optional, Tuple, List
 from datetime import datetime
-import json
 import asyncio
-import base64
+import heapq
+import operator
+import threading
 import wave
-import io
+import struct
 import numpy as np
-import soundfile
 import websockets
 from pathlib import Path
 from .auth import Authenticator
-from config import Config
+from config import CONFIG
+from src.utils.helpers import run_async, b64encode, dumps_json, loads_json
+
+# Sort key for (emotion, score) pairs
+BY_SCORE = operator.itemgetter(1)
+
+# audio_input envelope around the base64 WAV payload
+AUDIO_INPUT_PREFIX = b'{"type":"audio_input","data":"'
+AUDIO_INPUT_SUFFIX = b'"}'
+
+# RIFF/WAVE header for uncompressed PCM
+WAV_HEADER_FORMAT = "<4sI4s4sIHHIIHH4sI"
+WAV_HEADER_SIZE = struct.calcsize(WAV_HEADER_FORMAT)
 
 class SpeechToText:
     def __init__(self):
@@ -20,45 +32,40 @@ class SpeechToText:
         self.authenticator = Authenticator()
         
         # Audio processing parameters
-        self.sample_rate = Config.SAMPLE_RATE
-        self.channels = Config.CHANNELS
-        self.sample_width = Config.SAMPLE_WIDTH
+        self.sample_rate = CONFIG.SAMPLE_RATE
+        self.channels = CONFIG.CHANNELS
+        self.sample_width = CONFIG.SAMPLE_WIDTH
+        
+        # Per-thread WAV scratch buffers for _process_audio
+        self._buffers = threading.local()
         
         # Response handling
         self.message_timeout = 2.0  # seconds to wait for complete response
         
+        # Debug capture, sampled and written off the transcription path
+        self.debug_enabled = CONFIG.DEBUG.lower() == "true"
+        self._debug_counter = 0
+        self._debug_tasks = set()
+        
         # Debug directory setup
         self.debug_dir = Path("debug_sessions") / datetime.now().strftime("%Y%m%d_%H%M%S")
         self.debug_dir.mkdir(parents=True, exist_ok=True)
 
-    async def _send_to_hume(self, socket_url: str, encoded_audio: str) -> Optional[dict]:
-        """Send audio to Hume API via WebSocket and get results"""
+    async def _send_to_hume(self, socket, audio_message: str) -> Optional[Tuple[str, List[tuple]]]:
+        """Send audio over an open Hume WebSocket and get (transcript, top emotions)"""
         try:
-            async with websockets.connect(socket_url) as socket:
-                # Send audio data
-                json_message = json.dumps({
-                    "type": "audio_input",
-                    "data": encoded_audio
-                })
-                await socket.send(json_message)
-                
-                # Initialize response handling
-                start_time = asyncio.get_event_loop().time()
-                messages = []
-                transcript = None
-                emotions = None
-                
-                # Wait for responses with timeout
-                while True:
-                    try:
-                        # Set a timeout for message reception
-                        message = await asyncio.wait_for(
-                            socket.recv(),
-                            timeout=self.message_timeout
-                        )
-                        
-                        json_message = json.loads(message)
-                        messages.append(json_message)
+            # Send the prebuilt audio_input message as one text frame
+            await socket.send(audio_message)
+            
+            # Initialize response handling
+            transcript = None
+            emotions = None
+            
+            # Wait for responses under one overall deadline
+            try:
+                async with asyncio.timeout(self.message_timeout):
+                    async for message in socket:
+                        json_message = loads_json(message)
                         
                         # Handle different message types
                         if json_message.get("type") == "transcription":
@@ -68,56 +75,25 @@ class SpeechToText:
                             # Get prosody scores
                             prosody_scores = json_message["models"].get("prosody", {}).get("scores", {})
                             if prosody_scores:
-                                emotions = sorted(
-                                    prosody_scores.items(),
-                                    key=lambda x: x[1],
-                                    reverse=True
-                                )[:3]
+                                emotions = [
+                                    (emotion, float(score))
+                                    for emotion, score in heapq.nlargest(3, prosody_scores.items(), key=BY_SCORE)
+                                ]
                         
                         # Check if we have both transcript and emotions
                         if transcript and emotions:
-                            # Construct final response
-                            final_response = {
-                                "type": "user_message",
-                                "message": {
-                                    "content": transcript
-                                },
-                                "models": {
-                                    "prosody": {
-                                        "scores": dict(emotions)
-                                    }
-                                }
-                            }
-                            return final_response
-                            
-                        # Check timeout
-                        current_time = asyncio.get_event_loop().time()
-                        if current_time - start_time > self.message_timeout:
-                            self.logger.warning("Response timeout reached")
-                            break
+                            return transcript, emotions
                             
-                    except asyncio.TimeoutError:
-                        self.logger.warning("WebSocket receive timeout")
-                        break
-                    except Exception as e:
-                        self.logger.error(f"Error receiving message: {e}")
-                        break
-                
-                # If we get here without returning, construct response from what we have
-                return {
-                    "type": "user_message",
-                    "message": {
-                        "content": transcript or ""
-                    },
-                    "models": {
-                        "prosody": {
-                            "scores": dict(emotions or [])
-                        }
-                    }
-                }
+            except TimeoutError:
+                self.logger.warning("Response timeout reached")
+            except Exception as e:
+                self.logger.error("Error receiving message: %s", e)
+            
+            # If we get here without returning, return what we have
+            return transcript or "", emotions or []
 
         except Exception as e:
-            self.logger.error(f"Error in WebSocket communication: {e}")
+            self.logger.error("Error in WebSocket communication: %s", e)
             return None
             
     def transcribe_audio(self, audio_bytes: bytes) -> Optional[Tuple[str, List[tuple]]]:
@@ -131,23 +107,14 @@ class SpeechToText:
             Optional[Tuple[str, List[tuple]]]: Tuple of (transcript, emotions) if successful
         """
         try:
-            # Create new event loop for async operations
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            # Run async transcription
-            result = loop.run_until_complete(self._transcribe_audio_async(audio_bytes))
-            
-            # Clean up
-            loop.close()
-            
-            return result
+            # The pooled clients are bound to the shared background loop, so run there
+            return run_async(self.transcribe_audio_async(audio_bytes))
             
         except Exception as e:
-            self.logger.error(f"Error in synchronous transcription wrapper: {e}")
+            self.logger.error("Error in synchronous transcription wrapper: %s", e)
             return None
 
-    async def _transcribe_audio_async(self, audio_bytes: bytes) -> Optional[Tuple[str, List[tuple]]]:
+    async def transcribe_audio_async(self, audio_bytes: bytes) -> Optional[Tuple[str, List[tuple]]]:
         """
         Async implementation of audio transcription
         
@@ -157,104 +124,143 @@ class SpeechToText:
         Returns:
             Optional[Tuple[str, List[tuple]]]: Tuple of (transcript, emotions) if successful
         """
+        socket = None
         try:
-            # Get fresh token
-            self.logger.info("Fetching access token...")
-            access_token = self.authenticator.fetch_access_token()
-            self.logger.info(f"Access token received: {bool(access_token)}")
-            
-            if not access_token:
-                self.logger.error("No access token received from authenticator")
-                raise ValueError("Failed to get valid Hume access token")
+            # Open the websocket (token + TLS + upgrade) while the audio is encoded in a thread
+            self.logger.info("Connecting to Hume API and processing audio data...")
+            socket, audio_message = await asyncio.gather(
+                self._connect(),
+                asyncio.to_thread(self._process_audio, audio_bytes)
+            )
 
-            # Process audio data
-            self.logger.info("Processing audio data...")
-            processed_audio = await self._process_audio(audio_bytes)
-            if not processed_audio:
+            if not audio_message:
                 self.logger.error("Audio processing failed")
                 raise ValueError("Failed to process audio data")
 
-            # Log URL construction
-            socket_url = (
-                "wss://api.hume.ai/v0/evi/chat?"
-                f"access_token={access_token}&"
-                "config_id=44d4a322-684f-45b1-8261-1be941534e04"
-            )
-            self.logger.info(f"WebSocket URL constructed (token hidden)")
-
             # Send audio and get response
             self.logger.info("Sending audio to Hume API...")
-            result = await self._send_to_hume(socket_url, processed_audio)
+            result = await self._send_to_hume(socket, audio_message)
             if not result:
                 self.logger.error("No response received from Hume API")
                 raise ValueError("No response from Hume API")
 
+            if self.debug_enabled:
+                transcript, emotions = result
+                self._schedule_debug_save(audio_bytes, {"transcript": transcript, "emotions": emotions})
+
+            return result
+
         except Exception as e:
-            self.logger.error(f"Error in async speech transcription: {e}")
+            self.logger.error("Error in async speech transcription: %s", e)
             return None
+        finally:
+            if socket is not None:
+                await socket.close()
 
-    async def _process_audio(self, audio_data: bytes) -> Optional[str]:
-        """Process audio data for Hume API"""
-        try:
-            # Convert to mono if stereo
-            if self.channels == 2:
-                stereo_data = np.frombuffer(audio_data, dtype=np.int16)
-                mono_data = ((stereo_data[0::2] + stereo_data[1::2]) / 2).astype(np.int16)
-                audio_data = mono_data.tobytes()
+    async def _connect(self):
+        """Fetch an access token and open the Hume EVI websocket"""
+        access_token = await self.authenticator.fetch_access_token()
+        self.logger.info("Access token received: %s", bool(access_token))
+        if not access_token:
+            self.logger.error("No access token received from authenticator")
+            raise ValueError("Failed to get valid Hume access token")
 
-            # Create WAV in memory
-            wav_buffer = io.BytesIO()
-            with wave.open(wav_buffer, "wb") as wf:
-                wf.setnchannels(1)  # Always mono for API
-                wf.setsampwidth(self.sample_width)
-                wf.setframerate(self.sample_rate)
-                wf.writeframes(audio_data)
+        socket_url = CONFIG.get_websocket_url(access_token)
+        self.logger.info("WebSocket URL constructed (token hidden)")
+        # Base64 audio barely deflates, so skip per-message compression
+        return await websockets.connect(
+            socket_url,
+            compression=None,
+            max_size=2 ** 22,
+            ping_interval=20,
+            ping_timeout=10
+        )
 
-            # Encode for API
-            encoded_audio = base64.b64encode(wav_buffer.getvalue()).decode('utf-8')
-            return encoded_audio
+    def _wav_buffer(self, data_size: int) -> memoryview:
+        """
+        Get this thread's reusable WAV buffer, sized for data_size bytes of mono PCM
 
-        except Exception as e:
-            self.logger.error(f"Error processing audio: {e}")
-            return None
-            
-    def _extract_results(self, result: dict) -> Tuple[str, List[tuple]]:
-        """Extract transcript and emotions from Hume results"""
+        The buffer only grows, so steady utterance lengths stop allocating. It is
+        thread-local because encoding runs in worker threads for concurrent sessions.
+
+        Args:
+            data_size (int): Bytes of PCM samples
+
+        Returns:
+            memoryview: View of exactly header + data_size bytes, header filled in
+        """
+        size = WAV_HEADER_SIZE + data_size
+        buffer = getattr(self._buffers, "wav", None)
+        if buffer is None or len(buffer) < size:
+            buffer = self._buffers.wav = bytearray(size)
+
+        block_align = self.sample_width  # Always mono for API
+        struct.pack_into(
+            WAV_HEADER_FORMAT, buffer, 0,
+            b"RIFF", size - 8, b"WAVE",
+            b"fmt ", 16, 1, 1, self.sample_rate, self.sample_rate * block_align, block_align, self.sample_width * 8,
+            b"data", data_size
+        )
+        return memoryview(buffer)[:size]
+
+    def _process_audio(self, audio_data: bytes) -> Optional[str]:
+        """Build the audio_input message for Hume API (CPU-bound; run in a worker thread)"""
         try:
-            # Extract transcript
-            transcript = result.get("message", {}).get("content", "")
-            
-            # Extract emotions
-            prosody_scores = result.get("models", {}).get("prosody", {}).get("scores", {})
-            emotions = sorted(
-                prosody_scores.items(), 
-                key=lambda x: x[1], 
-                reverse=True
-            )[:3]  # Top 3 emotions
+            # Header and PCM go into one reused buffer, which is base64-encoded in a single pass
+            if self.channels == 2:
+                # Downmix straight into the WAV buffer: int32 sum, shift, store as int16
+                stereo_data = np.frombuffer(audio_data, dtype=np.int16).reshape(-1, 2)
+                wav = self._wav_buffer(stereo_data.shape[0] * 2)
+                mono_data = np.frombuffer(wav, dtype=np.int16, offset=WAV_HEADER_SIZE)
+                np.right_shift(
+                    np.add(stereo_data[:, 0], stereo_data[:, 1], dtype=np.int32),
+                    1,
+                    out=mono_data,
+                    casting="unsafe"
+                )
+            else:
+                wav = self._wav_buffer(len(audio_data))
+                wav[WAV_HEADER_SIZE:] = audio_data
 
-            return transcript, [(emotion, float(score)) for emotion, score in emotions]
+            # EVI only accepts base64 audio inside a JSON text frame. Base64 needs no JSON
+            # escaping, so splice it into the constant envelope with a single join here,
+            # off the event loop, instead of concatenating strings before the send
+            return b"".join((
+                AUDIO_INPUT_PREFIX,
+                b64encode(wav),
+                AUDIO_INPUT_SUFFIX
+            )).decode('ascii')
 
         except Exception as e:
-            self.logger.error(f"Error extracting results: {e}")
-            return "", []
+            self.logger.error("Error processing audio: %s", e)
+            return None
+            
+    def _schedule_debug_save(self, audio_data: bytes, api_response: dict):
+        """Save every DEBUG_SAMPLE_RATE-th utterance in a background thread without awaiting it"""
+        self._debug_counter += 1
+        if self._debug_counter % CONFIG.DEBUG_SAMPLE_RATE:
+            return
+        task = asyncio.create_task(asyncio.to_thread(self._save_debug_data, audio_data, api_response))
+        # Hold a reference until the write finishes so the task is not garbage collected
+        self._debug_tasks.add(task)
+        task.add_done_callback(self._debug_tasks.discard)
 
-    async def _save_debug_data(self, audio_data: bytes, api_response: dict):
+    def _save_debug_data(self, audio_data: bytes, api_response: dict):
         """Save debug information"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
             
             # Save audio
             audio_path = self.debug_dir / f"audio_{timestamp}.wav"
             with wave.open(str(audio_path), "wb") as wf:
-                wf.setnchannels(1)
+                wf.setnchannels(self.channels)
                 wf.setsampwidth(self.sample_width)
                 wf.setframerate(self.sample_rate)
                 wf.writeframes(audio_data)
 
             # Save API response
             response_path = self.debug_dir / f"response_{timestamp}.json"
-            with open(response_path, "w") as f:
-                json.dump(api_response, f, indent=2)
+            response_path.write_bytes(dumps_json(api_response))
 
         except Exception as e:
-            self.logger.error(f"Error saving debug data: {e}")
\ No newline at end of file
+            self.logger.error("Error saving debug data: %s", e)
\ No newline at end of file
@@ -1,27 +1,62 @@
 import os
 import platform
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 from google.cloud import texttospeech
-from typing import Callable
+from typing import Callable, Optional
+import shutil
 import subprocess
-import wave
-from config import Config
+from config import CONFIG
 from pathlib import Path
+from xml.sax.saxutils import escape
 
 # Import winsound for Windows
 if platform.system() == "Windows":
     import winsound
 
+# Minimal SSML envelope: pitch, rate, escaped text
+SSML_TEMPLATE = '<speak><prosody pitch="%s" rate="%s">%s</prosody></speak>'
+
 class TextToSpeech:
     def __init__(self):
         """Initialize TTS service with Google Cloud client"""
         # Set Google Cloud credentials
-        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = Config.GOOGLE_APPLICATION_CREDENTIALS
+        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = CONFIG.GOOGLE_APPLICATION_CREDENTIALS
         self.tts_client = texttospeech.TextToSpeechClient()
+        # Voice and output format never change, so build the request messages once
+        self.wavenet_voice = texttospeech.VoiceSelectionParams(
+            language_code="en-US",
+            name="en-US-Wavenet-D",
+            ssml_gender=texttospeech.SsmlVoiceGender.FEMALE
+        )
+        self.wavenet_audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding.LINEAR16
+        )
         self.logger = logging.getLogger(__name__)
         self.speaking_callback = None
         self._is_speaking = False
+
+        # Resolve the system audio player once
+        system = platform.system()
+        if system == "Darwin":  # macOS
+            self._play = self._play_macos
+        elif system == "Windows":
+            self._play = self._play_windows
+        else:  # Linux
+            self._play = self._play_linux
+
+        # Player that decodes MP3 from stdin, so ElevenLabs audio can play while downloading
+        self._mp3_stream_player = None
+        if system != "Windows":
+            if shutil.which("mpg123"):
+                self._mp3_stream_player = ["mpg123", "-q", "-"]
+            elif shutil.which("ffplay"):
+                self._mp3_stream_player = ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet", "-"]
+
+        # Keep-alive session so repeated ElevenLabs requests skip the TLS handshake
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
         
     def register_speaking_callback(self, callback: Callable[[bool], None]):
         """Register callback for speaking state changes"""
@@ -33,7 +68,7 @@ class TextToSpeech:
             if self.speaking_callback:
                 self.speaking_callback(is_speaking)
         except Exception as e:
-            self.logger.error(f"Error in speaking callback: {e}")
+            self.logger.error("Error in speaking callback: %s", e)
 
     def speak_with_elevenlabs(self, text: str):
         """
@@ -55,7 +90,7 @@ class TextToSpeech:
             headers = {
                 "Accept": "audio/mpeg",
                 "Content-Type": "application/json",
-                "xi-api-key": Config.ELEVENLABS_API_KEY
+                "xi-api-key": CONFIG.ELEVENLABS_API_KEY
             }
             data = {
                 "text": text,
@@ -69,21 +104,34 @@ class TextToSpeech:
             }
 
             # Make API request
-            response = requests.post(url, json=data, headers=headers, stream=True)
+            response = self._session.post(url, json=data, headers=headers, stream=True)
             response.raise_for_status()
 
+            response.raw.decode_content = True
+            if self._mp3_stream_player:
+                # Start playback as the first bytes arrive instead of after the download
+                with subprocess.Popen(
+                    self._mp3_stream_player,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                ) as player:
+                    shutil.copyfileobj(response.raw, player.stdin, length=64 * 1024)
+                    player.stdin.close()
+                if player.returncode:
+                    raise subprocess.CalledProcessError(player.returncode, self._mp3_stream_player)
+                return
+
             # Write audio file
-            output_path = Path(Config.TEMP_DIR) / "output.mp3"
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        f.write(chunk)
+            output_path = Path(CONFIG.TEMP_DIR) / "output.mp3"
+            with open(output_path, 'wb', buffering=0) as f:
+                shutil.copyfileobj(response.raw, f, length=64 * 1024)
 
             # Play the audio
             self._play_audio(str(output_path))
 
         except Exception as e:
-            self.logger.error(f"ElevenLabs TTS Error: {e}")
+            self.logger.error("ElevenLabs TTS Error: %s", e)
         finally:
             self._is_speaking = False
             self._notify_speaking_state(False)
@@ -97,80 +145,95 @@ class TextToSpeech:
             pitch (str): Voice pitch adjustment
             rate (str): Speech rate
         """
+        audio_content = self.synthesize_with_wavenet(text, pitch, rate)
+        if audio_content:
+            self.play_audio_content(audio_content)
+
+    def synthesize_with_wavenet(self, text: str, pitch: str = "-10%", rate: str = "medium") -> Optional[bytes]:
+        """
+        Generate audio using Google Cloud Wavenet without playing it
+        
+        Args:
+            text (str): Text to convert to speech
+            pitch (str): Voice pitch adjustment
+            rate (str): Speech rate
+            
+        Returns:
+            Optional[bytes]: LINEAR16 WAV audio, or None on failure
+        """
         if not text or len(text.strip()) == 0:
             self.logger.error("Empty or invalid input for text-to-speech.")
-            return
+            return None
 
         try:
-            # Notify that TTS is starting
-            self._is_speaking = True
-            self._notify_speaking_state(True)
-                
-            # Prepare SSML
-            ssml_text = f"""
-            <speak>
-                <prosody pitch="{pitch}" rate="{rate}">
-                    {text}
-                </prosody>
-            </speak>
-            """
+            # Prepare SSML; escape the text so stray &, < or > cannot break the markup
+            ssml_text = SSML_TEMPLATE % (pitch, rate, escape(text))
             
             # Configure synthesis input
             input_text = texttospeech.SynthesisInput(ssml=ssml_text)
-            voice = texttospeech.VoiceSelectionParams(
-                language_code="en-US",
-                name="en-US-Wavenet-D",
-                ssml_gender=texttospeech.SsmlVoiceGender.FEMALE
-            )
-            audio_config = texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.LINEAR16
-            )
 
             # Generate speech
             response = self.tts_client.synthesize_speech(
                 input=input_text,
-                voice=voice,
-                audio_config=audio_config
+                voice=self.wavenet_voice,
+                audio_config=self.wavenet_audio_config
             )
+            return response.audio_content
+
+        except Exception as e:
+            self.logger.error("WaveNet TTS Error: %s", e)
+            return None
+
+    def play_audio_content(self, audio_content: bytes):
+        """
+        Play synthesized WAV audio
+        
+        Args:
+            audio_content (bytes): Audio returned by synthesize_with_wavenet
+        """
+        try:
+            # Notify that TTS is starting
+            self._is_speaking = True
+            self._notify_speaking_state(True)
 
             # Save audio file
-            output_path = Path(Config.TEMP_DIR) / "output.wav"
+            output_path = Path(CONFIG.TEMP_DIR) / "output.wav"
             with open(output_path, "wb") as out:
-                out.write(response.audio_content)
+                out.write(audio_content)
 
             # Play audio
             self._play_audio(str(output_path))
 
         except Exception as e:
-            self.logger.error(f"WaveNet TTS Error: {e}")
+            self.logger.error("WaveNet playback Error: %s", e)
         finally:
             self._is_speaking = False
             self._notify_speaking_state(False)
 
     def _play_audio(self, file_path: str):
         """
-        Play audio file using appropriate system player
+        Play audio file using the system player bound at init
         
         Args:
             file_path (str): Path to audio file
         """
         try:
-            # Get audio duration before playing
-            with wave.open(file_path, 'rb') as wave_file:
-                duration_seconds = wave_file.getnframes() / wave_file.getframerate()
-                
-            # Play audio based on operating system
-            if platform.system() == "Darwin":  # macOS
-                subprocess.run(["afplay", file_path], check=True)
-            elif platform.system() == "Windows":
-                winsound.PlaySound(file_path, winsound.SND_FILENAME)
-            else:  # Linux
-                subprocess.run(["aplay", file_path], check=True)
-
-            # Notify that speaking has finished
-            self._notify_speaking_state(False)
-
+            self._play(file_path)
         except Exception as e:
-            self.logger.error(f"Error playing audio: {e}")
-            self._notify_speaking_state(False)
-            raise
\ No newline at end of file
+            self.logger.error("Error playing audio: %s", e)
+            raise
+
+    @staticmethod
+    def _play_macos(file_path: str):
+        """Play audio with afplay"""
+        subprocess.run(["afplay", file_path], check=True)
+
+    @staticmethod
+    def _play_windows(file_path: str):
+        """Play audio with winsound"""
+        winsound.PlaySound(file_path, winsound.SND_FILENAME)
+
+    @staticmethod
+    def _play_linux(file_path: str):
+        """Play audio with aplay"""
+        subprocess.run(["aplay", file_path], check=True)
@@ -1,15 +1,51 @@
 import json
 import asyncio
+import heapq
+import itertools
+import operator
 import websockets
 import numpy as np
 import soundfile
 import io
 import wave
-import base64
 import logging
+import struct
+import time
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from typing import List, Union
+from src.utils.helpers import b64encode, dumps_json, loads_json
+
+# Base64 audio barely deflates, so skip per-message compression. Allow
+# multi-megabyte messages with 1 MiB socket buffers, and bound the incoming
+# queue so a stalled consumer applies backpressure instead of growing memory
+SOCKET_OPTIONS = {
+    "compression": None,
+    "max_queue": 64,
+    "max_size": 2 ** 24,
+    "read_limit": 2 ** 20,
+    "write_limit": 2 ** 20,
+}
+
+# Sort key for (emotion, score) pairs
+BY_SCORE = operator.itemgetter(1)
+
+# Hume AI expects 16 kHz, 16-bit mono WAV
+HUME_SAMPLE_RATE = 16000
+WAV_HEADER_FORMAT = "<4sI4s4sIHHIIHH4sI"
+
+# audio_input envelope around the base64 WAV payload
+AUDIO_INPUT_PREFIX = '{"type":"audio_input","data":"'
+AUDIO_INPUT_SUFFIX = '"}'
+# WAV bytes per base64 fragment; a multiple of 3 so no fragment carries padding
+SEND_CHUNK_SIZE = 48 * 1024
+
+# Debug session shared by every connection in the process: one directory, one clock,
+# and one recording sequence so files from different connections never collide
+SESSION_TIMESTAMP = datetime.now().strftime("%Y%m%d_%H%M%S")
+SESSION_START_NS = time.monotonic_ns()
+RECORDING_IDS = itertools.count(1)
 
 class WebSocketConnection:
     def __init__(self):
@@ -21,7 +57,7 @@ class WebSocketConnection:
         
         # Create debug directories
         self.debug_base_dir = Path("debug_sessions")
-        self.session_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.session_timestamp = SESSION_TIMESTAMP
         self.session_dir = self.debug_base_dir / f"session_{self.session_timestamp}"
         self.audio_dir = self.session_dir / "audio"
         self.hume_dir = self.session_dir / "hume_responses"
@@ -33,6 +69,12 @@ class WebSocketConnection:
         # Initialize counter
         self.recording_counter = 0
 
+        # Debug writes are queued for a single writer task so disk latency never
+        # reaches the send/receive path; writes are dropped when the queue is full
+        self._debug_queue = asyncio.Queue(maxsize=256)
+        self._debug_task = None
+        self.dropped_debug_writes = 0
+
     def on_tts_state_change(self, is_speaking: bool):
         """Callback for TTS speaking state changes"""
         self.is_tts_speaking = is_speaking
@@ -51,56 +93,64 @@ class WebSocketConnection:
         self.logger.info("Starting WebSocket connection")
         while True:
             try:
-                async with websockets.connect(socket_url) as socket:
+                async with websockets.connect(socket_url, **SOCKET_OPTIONS) as socket:
                     self.logger.info("Connected to WebSocket successfully")
                     await self._handle_connection(socket)
             except websockets.exceptions.ConnectionClosed:
                 self.logger.warning("WebSocket connection closed. Attempting reconnection...")
                 await asyncio.sleep(5)
             except Exception as e:
-                self.logger.error(f"Connection error: {str(e)}. Attempting reconnection...")
+                self.logger.error("Connection error: %s. Attempting reconnection...", e)
                 await asyncio.sleep(5)
 
-    async def process_audio(self, audio_file: str, socket_url: str) -> dict:
+    async def process_audio(self, audio_file: Union[str, List[str]], socket_url: str) -> dict:
         """
         Process audio file through Hume AI
         
         Args:
-            audio_file (str): Path to audio file
+            audio_file (str | list): Path to audio file, or consecutive chunk
+                files to merge into a single audio_input message
             socket_url (str): WebSocket URL with authentication token
             
         Returns:
             dict: Processed response with text and emotions
         """
         try:
-            # Read audio file
-            with wave.open(audio_file, 'rb') as wf:
-                audio_data = wf.readframes(wf.getnframes())
+            # Read audio files; Hume takes one clip per audio_input, so chunks are
+            # concatenated into one WAV and sent as a single frame
+            paths = [audio_file] if isinstance(audio_file, str) else audio_file
+            chunks = []
+            frame_count = 0
+            for path in paths:
+                with wave.open(path, 'rb') as wf:
+                    nframes = wf.getnframes()
+                    frame_count += nframes
+                    chunks.append(wf.readframes(nframes))
+                    channels = wf.getnchannels()
+                    sample_rate = wf.getframerate()
+                    sample_width = wf.getsampwidth()
+            audio_data = b"".join(chunks)
                 
             # Save debug recording
-            timestamp, counter = await self._save_debug_recording(
+            timestamp, counter = self._save_debug_recording(
                 audio_data,
-                len(audio_data) / (wf.getframerate() * wf.getsampwidth())
+                frame_count / sample_rate
             )
             
             # Process audio through WebSocket
-            async with websockets.connect(socket_url) as socket:
+            async with websockets.connect(socket_url, **SOCKET_OPTIONS) as socket:
                 # Prepare audio data
-                wav_content = await self._prepare_audio_data(audio_data)
+                wav_content = await self._prepare_audio_data(audio_data, channels, sample_rate, sample_width)
                 
-                # Send audio
-                json_message = json.dumps({
-                    "type": "audio_input",
-                    "data": base64.b64encode(wav_content).decode('utf-8')
-                })
-                await socket.send(json_message)
+                # Send audio as one fragmented message instead of building the full JSON string
+                await socket.send(self._audio_input_fragments(wav_content))
                 
                 # Wait for response
                 response = await self._receive_response(socket)
                 
                 # Save Hume response
                 if response:
-                    await self._save_hume_response(
+                    self._save_hume_response(
                         response,
                         timestamp,
                         counter
@@ -109,18 +159,27 @@ class WebSocketConnection:
                 return response
                 
         except Exception as e:
-            self.logger.error(f"Error processing audio: {e}")
+            self.logger.error("Error processing audio: %s", e)
             return None
 
+    @staticmethod
+    def _audio_input_fragments(wav_content: bytes):
+        """Yield an audio_input message as text fragments, base64-encoding the WAV piece by piece"""
+        view = memoryview(wav_content)
+        yield AUDIO_INPUT_PREFIX
+        for start in range(0, len(view), SEND_CHUNK_SIZE):
+            yield b64encode(view[start:start + SEND_CHUNK_SIZE]).decode('ascii')
+        yield AUDIO_INPUT_SUFFIX
+
     async def _handle_connection(self, socket):
         """Handle active WebSocket connection"""
         try:
             async for message in socket:
                 try:
-                    response = json.loads(message)
+                    response = loads_json(message)
                     
                     # Save Hume response
-                    await self._save_hume_response(
+                    self._save_hume_response(
                         response,
                         getattr(self, 'last_audio_timestamp', None),
                         getattr(self, 'last_audio_counter', None)
@@ -147,26 +206,49 @@ class WebSocketConnection:
                             "emotions": emotions
                         }
                         
-                except json.JSONDecodeError as e:
-                    self.logger.error(f"JSON parsing error: {e}")
+                except json.JSONDecodeError as e:  # orjson's error subclasses this too
+                    self.logger.error("JSON parsing error: %s", e)
                     
         except Exception as e:
-            self.logger.error(f"WebSocket handling error: {e}")
+            self.logger.error("WebSocket handling error: %s", e)
+
+    async def _prepare_audio_data(self, audio_data: bytes, channels: int,
+                                  sample_rate: int, sample_width: int) -> bytes:
+        """
+        Prepare audio data for transmission
 
-    async def _prepare_audio_data(self, audio_data: bytes) -> bytes:
-        """Prepare audio data for transmission"""
+        The format must come from the source WAV; it is never guessed from the data.
+        """
         try:
+            # Already in Hume's format: prepend a header instead of re-encoding
+            if (channels, sample_rate, sample_width) == (1, HUME_SAMPLE_RATE, 2):
+                return struct.pack(
+                    WAV_HEADER_FORMAT,
+                    b"RIFF", 36 + len(audio_data), b"WAVE",
+                    b"fmt ", 16, 1, 1, HUME_SAMPLE_RATE, HUME_SAMPLE_RATE * 2, 2, 16,
+                    b"data", len(audio_data)
+                ) + audio_data
+
             # Convert to mono if needed
             np_array = np.frombuffer(audio_data, dtype=np.int16)
-            if len(np_array.shape) > 1:
-                np_array = np_array.mean(axis=1).astype(np.int16)
+            if channels == 2:
+                # Interleaved frames: average each pair with an int32 sum and shift,
+                # written straight into the int16 output instead of via float64 mean
+                stereo = np_array.reshape(-1, 2)
+                np_array = np.empty(stereo.shape[0], dtype=np.int16)
+                np.right_shift(
+                    np.add(stereo[:, 0], stereo[:, 1], dtype=np.int32),
+                    1,
+                    out=np_array,
+                    casting="unsafe"
+                )
             
             # Create WAV in memory
             wav_buffer = io.BytesIO()
             soundfile.write(
                 wav_buffer,
                 np_array,
-                samplerate=16000,  # Hume AI expects 16kHz
+                samplerate=HUME_SAMPLE_RATE,
                 subtype="PCM_16",
                 format="WAV"
             )
@@ -174,33 +256,61 @@ class WebSocketConnection:
             return wav_buffer.getvalue()
             
         except Exception as e:
-            self.logger.error(f"Error preparing audio: {e}")
+            self.logger.error("Error preparing audio: %s", e)
             raise
 
     async def _process_emotion_data(self, prosody_scores: dict) -> list:
         """Process emotion scores from Hume AI response"""
         try:
-            # Sort emotions by score
-            emotions = sorted(
-                prosody_scores.items(),
-                key=lambda x: x[1],
-                reverse=True
-            )[:3]  # Get top 3 emotions
+            # Get top 3 emotions without sorting the full score set
+            emotions = heapq.nlargest(3, prosody_scores.items(), key=BY_SCORE)
             
             return [(emotion, float(score)) for emotion, score in emotions]
             
         except Exception as e:
-            self.logger.error(f"Error processing emotions: {e}")
+            self.logger.error("Error processing emotions: %s", e)
             return []
 
+    def _queue_debug_write(self, write, *args):
+        """Hand a debug write to the writer task without waiting for it"""
+        if self._debug_task is None or self._debug_task.done():
+            self._debug_task = asyncio.get_running_loop().create_task(self._debug_writer())
+        try:
+            self._debug_queue.put_nowait((write, args))
+        except asyncio.QueueFull:
+            self.dropped_debug_writes += 1
+            self.logger.warning("Debug write queue full; %d writes dropped", self.dropped_debug_writes)
+
+    async def _debug_writer(self):
+        """Run queued debug writes one at a time on the worker thread"""
+        loop = asyncio.get_running_loop()
+        while True:
+            write, args = await self._debug_queue.get()
+            await loop.run_in_executor(self.executor, write, *args)
+
+    def _elapsed_ms(self) -> int:
+        """Milliseconds since the debug session started"""
+        return (time.monotonic_ns() - SESSION_START_NS) // 1_000_000
+
     def _save_debug_recording(self, audio_data: bytes, duration: float) -> tuple:
+        """Name the next debug recording and queue it for saving"""
+        self.recording_counter = next(RECORDING_IDS)
+        self._queue_debug_write(
+            self._write_debug_recording,
+            audio_data,
+            duration,
+            self.session_timestamp,
+            self.recording_counter,
+            self._elapsed_ms()
+        )
+        return self.session_timestamp, self.recording_counter
+
+    def _write_debug_recording(self, audio_data: bytes, duration: float, timestamp: str, counter: int,
+                               elapsed_ms: int):
         """Save audio recording for debugging"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            self.recording_counter += 1
-            
             # Save WAV file
-            wav_path = self.audio_dir / f"recording_{timestamp}_{self.recording_counter}.wav"
+            wav_path = self.audio_dir / f"recording_{timestamp}_{counter:06d}.wav"
             with wave.open(str(wav_path), 'wb') as wf:
                 wf.setnchannels(1)
                 wf.setsampwidth(2)
@@ -208,49 +318,56 @@ class WebSocketConnection:
                 wf.writeframes(audio_data)
             
             # Save metadata
-            metadata_path = self.audio_dir / f"recording_{timestamp}_{self.recording_counter}.json"
+            metadata_path = self.audio_dir / f"recording_{timestamp}_{counter:06d}.json"
             metadata = {
-                "timestamp": timestamp,
+                "session_timestamp": timestamp,
+                "elapsed_ms": elapsed_ms,
                 "duration_seconds": duration,
                 "file_size_bytes": len(audio_data)
             }
             
-            with open(metadata_path, 'w') as f:
-                json.dump(metadata, f, indent=4)
-            
-            return timestamp, self.recording_counter
+            metadata_path.write_bytes(dumps_json(metadata))
             
         except Exception as e:
-            self.logger.error(f"Error saving debug recording: {e}")
-            return None, None
+            self.logger.error("Error saving debug recording: %s", e)
+
+    def _save_hume_response(self, response: dict, audio_timestamp: str, audio_counter: int):
+        """Queue a Hume AI response for saving"""
+        if audio_timestamp and audio_counter:
+            self._queue_debug_write(
+                self._write_hume_response,
+                response,
+                audio_timestamp,
+                audio_counter,
+                self._elapsed_ms()
+            )
 
-    async def _save_hume_response(self, response: dict, audio_timestamp: str, audio_counter: int):
-        """Save Hume AI response for debugging"""
+    def _write_hume_response(self, response: dict, audio_timestamp: str, audio_counter: int, elapsed_ms: int):
+        """Write a Hume AI response next to its debug recording"""
         try:
             if audio_timestamp and audio_counter:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 response_type = response.get('type', 'unknown')
                 
-                response_path = self.hume_dir / f"{response_type}_{timestamp}_{audio_counter}.json"
+                response_path = self.hume_dir / f"{response_type}_{audio_counter:06d}_{elapsed_ms}.json"
                 
-                response["debug_info"] = {
-                    "corresponding_audio": f"recording_{audio_timestamp}_{audio_counter}.wav",
-                    "response_timestamp": timestamp,
+                # Annotate a copy; the caller may still be reading the response
+                saved = {**response, "debug_info": {
+                    "corresponding_audio": f"recording_{audio_timestamp}_{audio_counter:06d}.wav",
+                    "response_elapsed_ms": elapsed_ms,
                     "message_type": response_type
-                }
+                }}
                 
-                with open(response_path, 'w') as f:
-                    json.dump(response, f, indent=4)
+                response_path.write_bytes(dumps_json(saved))
                 
         except Exception as e:
-            self.logger.error(f"Error saving Hume response: {e}")
+            self.logger.error("Error saving Hume response: %s", e)
 
     async def _receive_response(self, socket) -> dict:
         """Wait for and process response from WebSocket"""
         try:
             while True:
                 message = await socket.recv()
-                response = json.loads(message)
+                response = loads_json(message)
                 
                 if response.get("type") == "user_message" and "models" in response:
                     user_message = response.get("message", {}).get("content", "")
@@ -263,5 +380,5 @@ class WebSocketConnection:
                     }
                     
         except Exception as e:
-            self.logger.error(f"Error receiving response: {e}")
+            self.logger.error("Error receiving response: %s", e)
             return None
\ No newline at end of file
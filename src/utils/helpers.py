@@ -1,13 +1,96 @@
 import re
+import json
+import asyncio
 import logging
+import threading
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 import streamlit as st
-from typing import List, Dict, Any
+from typing import Any, Awaitable, Dict, List, Optional, TypeVar
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Text patterns, compiled once instead of looked up in re's cache on every call
+NON_ALPHA_PATTERN = re.compile(r'[^a-zA-Z]')
+NON_TEXT_PATTERN = re.compile(r'[^\w\s.,!?-]')
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# ASCII table for normalize_string: drop non-letters and fold case in one translate pass
+ASCII_LETTERS_LOWER = {
+    c: (c + 32 if 65 <= c <= 90 else None)
+    for c in range(128)
+    if not 97 <= c <= 122
+}
+
+# orjson parses several times faster; fall back to the stdlib with the same bytes interface
+try:
+    import orjson
+
+    def dumps_json(obj, indent: bool = False) -> bytes:
+        """Serialize obj to JSON bytes"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+
+    loads_json = orjson.loads
+except ImportError:
+    def dumps_json(obj, indent: bool = False) -> bytes:
+        """Serialize obj to JSON bytes"""
+        if indent:
+            return json.dumps(obj, indent=2).encode()
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    loads_json = json.loads
+
+# pybase64 encodes with SIMD; the stdlib encoder produces identical output
+try:
+    from pybase64 import b64encode
+except ImportError:
+    from base64 import b64encode
+
+# uvloop speeds up the websocket and HTTP I/O on the background loop; it is not available on Windows
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Process-wide event loop shared by the async service clients
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the process-wide event loop, starting its thread on first use
+
+    Async SDK clients keep connection pools bound to the loop that opened them,
+    so every coroutine that uses them must run on this one loop.
+
+    Returns:
+        asyncio.AbstractEventLoop: Running background loop
+    """
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-io", daemon=True).start()
+            _background_loop = loop
+    return _background_loop
+
+def run_async(coro: Awaitable[T]) -> T:
+    """
+    Run a coroutine on the background event loop and wait for its result
+
+    Args:
+        coro: Coroutine to run; it must not touch st.session_state
+
+    Returns:
+        Result of the coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_background_loop()).result()
+
+@lru_cache(maxsize=64)
 def normalize_string(input_string: str) -> str:
     """
     Remove special characters and convert to lowercase
@@ -18,46 +101,54 @@ def normalize_string(input_string: str) -> str:
     Returns:
         str: Normalized string
     """
-    return re.sub(r'[^a-zA-Z]', '', input_string).lower()
+    if input_string.isascii():
+        return input_string.translate(ASCII_LETTERS_LOWER)
+    return NON_ALPHA_PATTERN.sub('', input_string).lower()
 
-def format_conversation_for_email(conversation_repository: List[Dict[str, Any]]) -> str:
+# Email transcript layout
+ROLE_LABELS = {"user": "User"}
+EMAIL_DIVIDER = "-" * 50 + "\n"
+
+def format_conversation_for_email(conversation_repository: List[Any]) -> str:
     """
     Format conversation history for email
     
     Args:
-        conversation_repository (List[Dict]): List of conversation messages
+        conversation_repository (List[Message]): List of conversation messages
         
     Returns:
         str: Formatted conversation string
     """
-    formatted = "\nConversation Details:\n"
-    formatted += "-" * 50 + "\n"
+    parts = ["\nConversation Details:\n", EMAIL_DIVIDER]
+    append = parts.append
     
     for entry in conversation_repository:
-        role = "User" if entry["role"] == "user" else "TAFEP Advisor"
-        formatted += f"{role}: {entry['content']}\n"
-        if "emotions" in entry and entry["emotions"]:
-            emotions_str = ", ".join([f"{e}: {s:.1%}" for e, s in entry["emotions"]])
-            formatted += f"Emotions detected: {emotions_str}\n"
-        formatted += "-" * 50 + "\n"
+        append(f"{ROLE_LABELS.get(entry.role, 'TAFEP Advisor')}: {entry.content}\n")
+        if entry.emotions:
+            append("Emotions detected: ")
+            append(", ".join(f"{e}: {s:.1%}" for e, s in entry.emotions))
+            append("\n")
+        append(EMAIL_DIVIDER)
     
-    return formatted
+    return "".join(parts)
+
+def new_conversation_state() -> Dict[str, Any]:
+    """Build the initial conversation state; the single definition of its keys"""
+    return {
+        "issue_established": False,
+        "discrimination_type_categorized": False,
+        "probe_counter": 0,
+        "probing_completed": False,
+        "filing_offered": False,
+        "user_agreed_to_file_case": False,
+        "history_summary": "",
+        "summarized_through": None
+    }
 
 def initialize_session_state():
-    """Initialize Streamlit session state variables"""
-    if "messages" not in st.session_state:
-        st.session_state.messages = [
-            {"role": "assistant", "content": "Hello, welcome to TAFEP! How may I assist you today?"}
-        ]
-    
+    """Initialize Streamlit session state variables (chat messages are owned by ChatBox)"""
     if "conversation_state" not in st.session_state:
-        st.session_state.conversation_state = {
-            "issue_established": False,
-            "discrimination_type_categorized": False,
-            "probe_counter": 0,
-            "probing_completed": False,
-            "user_agreed_to_file_case": False
-        }
+        st.session_state.conversation_state = new_conversation_state()
     
     if "recording_state" not in st.session_state:
         st.session_state.recording_state = {
@@ -91,11 +182,11 @@ def save_debug_info(data: Any, category: str) -> Path:
         with open(file_path, 'w') as f:
             f.write(str(data))
             
-        logger.debug(f"Saved debug info to {file_path}")
+        logger.debug("Saved debug info to %s", file_path)
         return file_path
         
     except Exception as e:
-        logger.error(f"Error saving debug info: {e}")
+        logger.error("Error saving debug info: %s", e)
         return None
 
 def format_duration(seconds: float) -> str:
@@ -131,9 +222,19 @@ def clean_text(text: str) -> str:
     # Remove extra whitespace
     text = ' '.join(text.split())
     # Remove special characters except punctuation
-    text = re.sub(r'[^\w\s.,!?-]', '', text)
+    text = NON_TEXT_PATTERN.sub('', text)
     return text.strip()
 
+# Visualization colors by lowercase emotion name
+EMOTION_COLORS = {
+    "angry": "#FF4D4D",
+    "sad": "#4D79FF",
+    "happy": "#FFD700",
+    "neutral": "#808080",
+    "frustrated": "#FF6B6B",
+    "concerned": "#9370DB"
+}
+
 def get_emotion_color(emotion: str) -> str:
     """
     Get color code for emotion visualization
@@ -144,15 +245,7 @@ def get_emotion_color(emotion: str) -> str:
     Returns:
         str: Color hex code
     """
-    emotion_colors = {
-        "angry": "#FF4D4D",
-        "sad": "#4D79FF",
-        "happy": "#FFD700",
-        "neutral": "#808080",
-        "frustrated": "#FF6B6B",
-        "concerned": "#9370DB"
-    }
-    return emotion_colors.get(emotion.lower(), "#808080")
+    return EMOTION_COLORS.get(emotion.lower(), "#808080")
 
 def validate_email(email: str) -> bool:
     """
@@ -164,8 +257,7 @@ def validate_email(email: str) -> bool:
     Returns:
         bool: True if valid, False otherwise
     """
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    return bool(EMAIL_PATTERN.match(email))
 
 def create_case_reference() -> str:
     """
@@ -1,18 +1,25 @@
 # logger.py
 import logging
-from datetime import datetime
-import os
+import logging.handlers
 from pathlib import Path
 
+# Skip the per-record thread and process lookups; the formatters never use them
+logging.logThreads = False
+logging.logProcesses = False
+
 def setup_logging():
     """Configure logging for the application with daily rotating file handler"""
+    # Streamlit reruns call this on every interaction; configure only once per process
+    root_logger = logging.getLogger()
+    if any(isinstance(h, logging.handlers.MemoryHandler) for h in root_logger.handlers):
+        return
+    
     # Create logs directory if it doesn't exist
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
     
-    # Generate timestamp for the log file
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file = log_dir / f"tafep_{timestamp}.log"
+    # Rolled over at midnight into tafep.log.YYYY-MM-DD files
+    log_file = log_dir / "tafep.log"
     
     # Create formatters
     file_formatter = logging.Formatter(
@@ -22,17 +29,25 @@ def setup_logging():
         "%(levelname)s - %(message)s"
     )
     
-    # Get root logger
-    root_logger = logging.getLogger()
-    
-    # Remove any existing handlers to prevent duplicates
+    # Remove any existing handlers to prevent duplicates, flushing buffered records first
     while root_logger.handlers:
-        root_logger.removeHandler(root_logger.handlers[0])
+        handler = root_logger.handlers[0]
+        root_logger.removeHandler(handler)
+        handler.close()
+        if isinstance(handler, logging.handlers.MemoryHandler) and handler.target:
+            handler.target.close()
     
-    # Set up file handler
-    file_handler = logging.FileHandler(log_file)
+    # Set up file handler; keeps the last 7 days of logs
+    file_handler = logging.handlers.TimedRotatingFileHandler(log_file, when="midnight", backupCount=7)
     file_handler.setFormatter(file_formatter)
-    file_handler.setLevel(logging.DEBUG)  # Log everything to file
+    
+    # Buffer records and write them in batches, flushing immediately on errors
+    buffered_handler = logging.handlers.MemoryHandler(
+        capacity=1024,
+        flushLevel=logging.ERROR,
+        target=file_handler
+    )
+    buffered_handler.setLevel(logging.DEBUG)  # Log everything to file
     
     # Set up console handler
     console_handler = logging.StreamHandler()
@@ -41,7 +56,7 @@ def setup_logging():
     
     # Configure root logger
     root_logger.setLevel(logging.DEBUG)  # Capture all levels
-    root_logger.addHandler(file_handler)
+    root_logger.addHandler(buffered_handler)
     root_logger.addHandler(console_handler)
     
     # Configure specific loggers
@@ -58,20 +73,5 @@ def setup_logging():
     logging.getLogger('grpc').setLevel(logging.ERROR)
     
     # Log initial startup message
-    root_logger.info(f"Starting new session. Log file: {log_file}")
+    root_logger.info("Starting new session. Log file: %s", log_file)
     root_logger.info("Logging system initialized")
-    
-    # Create log rotation if needed
-    def cleanup_old_logs():
-        """Keep only last 7 days of logs"""
-        max_logs = 7
-        log_files = sorted(log_dir.glob("tafep_*.log"), reverse=True)
-        for log_file in log_files[max_logs:]:
-            try:
-                log_file.unlink()
-                root_logger.info(f"Removed old log file: {log_file}")
-            except Exception as e:
-                root_logger.error(f"Failed to remove old log file {log_file}: {e}")
-    
-    # Run cleanup
-    cleanup_old_logs()
\ No newline at end of file
@@ -0,0 +1,53 @@
+import pytest
+
+from src.conversation.consent import is_consent, requests_filing
+
+@pytest.mark.parametrize("reply", [
+    "Yes",
+    "Yeah, go ahead.",
+    "Sure, please file it.",
+    "Okay",
+    "Go ahead and submit it",
+])
+def test_affirmatives_are_consent(reply):
+    assert is_consent(reply)
+
+@pytest.mark.parametrize("reply", [
+    "No, I don't want to file a case.",
+    "Please don't file anything yet",
+    "I don't agree with what happened",
+    "Yes, but do not file it yet",
+    "Not yet, okay?",
+    "I'm not sure",
+    "Sure, I didn’t expect that",
+    "Please file it",
+    "I agree",
+])
+def test_refusals_and_non_affirmatives_are_not_consent(reply):
+    assert not is_consent(reply)
+
+@pytest.mark.parametrize("reply", [
+    "Yesterday my manager shouted at me",
+    "I saw it with my own eyes",
+    "Nobody saw it happen",
+])
+def test_whole_words_only(reply):
+    assert not is_consent(reply)
+
+@pytest.mark.parametrize("reply", [
+    "I want to file a case",
+    "I'd like to lodge a complaint with TAFEP",
+    "Can I file a report about this?",
+])
+def test_explicit_requests_to_file(reply):
+    assert requests_filing(reply)
+
+@pytest.mark.parametrize("reply", [
+    "Yes, my colleague Sarah saw it happen.",
+    "Sure, it was last Monday around 3pm.",
+    "Okay, I agree that was unfair",
+    "I reported it to my manager",
+    "I don't want to file a case.",
+])
+def test_probe_answers_do_not_request_filing(reply):
+    assert not requests_filing(reply)